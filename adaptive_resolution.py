@@ -0,0 +1,81 @@
+# adaptive_resolution.py
+# 自适应输入分辨率：根据实测推理耗时调整 imgsz，使视频 / 摄像头检测尽量保持目标帧率
+import math
+
+# imgsz 调整范围与步长（YOLO 输入边长需为 32 的倍数）
+MIN_IMGSZ = 320
+MAX_IMGSZ = 1280
+IMGSZ_STEP = 32
+DEFAULT_IMGSZ = 640
+# 每推理多少帧评估一次是否需要调整（调整后的前几帧耗时不稳定，不参与统计）
+EVALUATE_INTERVAL = 15
+SETTLE_FRAMES = 3
+# 推理耗时低于预算的该比例时才尝试提高分辨率，避免在两个尺寸之间来回切换
+UPSCALE_HEADROOM = 0.7
+# 平滑系数：推理耗时的指数移动平均
+EMA_ALPHA = 0.2
+
+
+def _round_imgsz(value, min_imgsz, max_imgsz):
+    value = int(round(value / IMGSZ_STEP)) * IMGSZ_STEP
+    return max(min_imgsz, min(max_imgsz, value))
+
+
+def format_resolution(stats):
+    """自适应分辨率状态的单行描述"""
+    text = f"Input size: {stats['imgsz']} px (target {stats['target_fps']:g} FPS"
+    if stats["inference_ms"] is not None:
+        text += f", inference {stats['inference_ms']:.0f} ms"
+    return text + ")"
+
+
+class ResolutionController:
+    """
+    目标帧率控制器：每帧推理后调用 update() 报告耗时，由它决定下一帧使用的 imgsz。
+    推理耗时近似与 imgsz 的平方成正比：超出预算时按比例一次降到位，有明显余量时每次只升一级。
+    """
+
+    def __init__(self, target_fps, min_imgsz=MIN_IMGSZ, max_imgsz=MAX_IMGSZ, initial_imgsz=None):
+        self.target_fps = target_fps
+        self.budget = 1.0 / target_fps
+        self.min_imgsz = min_imgsz
+        self.max_imgsz = max_imgsz
+        self.imgsz = _round_imgsz(initial_imgsz or DEFAULT_IMGSZ, min_imgsz, max_imgsz)
+        # 推理耗时的指数移动平均（秒）；切换分辨率后重新开始统计，旧值仅用于显示
+        self.latency = None
+        self._restart = True
+        self._frames = 0
+
+    def update(self, latency):
+        """报告一帧的推理耗时（秒）；到达评估间隔时返回 True（imgsz 可能已变化）"""
+        self._frames += 1
+        if self._frames <= SETTLE_FRAMES:
+            return False
+        if self._restart:
+            self.latency = latency
+            self._restart = False
+        else:
+            self.latency += EMA_ALPHA * (latency - self.latency)
+        if self._frames < EVALUATE_INTERVAL:
+            return False
+
+        new_imgsz = self.imgsz
+        if self.latency > self.budget:
+            scaled = self.imgsz * math.sqrt(self.budget / self.latency)
+            new_imgsz = min(self.imgsz - IMGSZ_STEP, _round_imgsz(scaled, self.min_imgsz, self.max_imgsz))
+        elif self.latency < self.budget * UPSCALE_HEADROOM:
+            new_imgsz = self.imgsz + IMGSZ_STEP
+        new_imgsz = max(self.min_imgsz, min(self.max_imgsz, new_imgsz))
+
+        self._frames = 0
+        if new_imgsz != self.imgsz:
+            self.imgsz = new_imgsz
+            self._restart = True
+        return True
+
+    def stats(self):
+        return {
+            "imgsz": self.imgsz,
+            "target_fps": self.target_fps,
+            "inference_ms": self.latency * 1000 if self.latency is not None else None,
+        }
@@ -0,0 +1,372 @@
+# benchmark.py
+# 分阶段性能基准：用生成的图片和视频驱动检测核心，分别统计解码、前处理、推理、NMS、Top-K、绘制、
+# 结果格式化、信号传递与数据库写入的耗时，结果保存为 JSON 并与基线比较。
+# 未指定模型时使用随机初始化的小模型，可在无网络的 CPU 机器上运行。
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+# 基线文件默认路径，以及默认允许的变慢比例（0.2 表示中位数耗时增加超过 20% 视为退化）
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.2
+# 中位数耗时差异小于该值（毫秒）时不判定退化，避免极短阶段的计时抖动造成误报
+MIN_DELTA_MS = 0.05
+# 未指定模型时使用的随机初始化模型结构（由 ultralytics 内置配置构建，无需下载权重）
+RANDOM_MODEL_CFG = "yolo11n.yaml"
+# 随机模型的输出置信度很低，需用很小的 conf 才能产生足够的检测框来测量 NMS / Top-K
+RANDOM_MODEL_CONF = 0.0001
+
+STAGES = ["image_decode", "video_decode", "preprocess", "inference", "nms", "top_k", "plot",
+          "extract", "format", "signal", "db_write", "video_pipeline"]
+
+
+class StageTimer:
+    """按阶段收集耗时样本（毫秒）"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        yield
+        self.samples[stage].append((time.perf_counter() - start) * 1000)
+
+    def add(self, stage, ms):
+        self.samples[stage].append(ms)
+
+    def summary(self):
+        result = {}
+        for stage in STAGES:
+            values = self.samples.get(stage)
+            if not values:
+                continue
+            ordered = sorted(values)
+            result[stage] = {
+                "count": len(values),
+                "mean_ms": statistics.fmean(values),
+                "median_ms": statistics.median(values),
+                "p95_ms": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+                "total_ms": sum(values),
+            }
+        return result
+
+
+def generate_image(rng, width, height):
+    """生成带随机色块的合成图片，让模型产生一定数量的检测框"""
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)
+    image = np.dstack([np.tile(gradient, (height, 1))] * 3)
+    image = cv2.add(image, rng.integers(0, 40, image.shape, dtype=np.uint8))
+    for _ in range(rng.integers(3, 8)):
+        x1, y1 = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+        x2, y2 = x1 + int(rng.integers(20, width // 3)), y1 + int(rng.integers(20, height // 3))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, -1)
+    return image
+
+
+def generate_inputs(work_dir, count, frames, width, height, seed=0):
+    """生成 JPEG 图片（返回编码后的字节）与一段 mp4 视频（返回路径）"""
+    rng = np.random.default_rng(seed)
+    encoded = []
+    for _ in range(count):
+        ok, buffer = cv2.imencode(".jpg", generate_image(rng, width, height))
+        encoded.append(buffer.tobytes())
+    video_path = os.path.join(work_dir, "synthetic.mp4")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (width, height))
+    for _ in range(frames):
+        writer.write(generate_image(rng, width, height))
+    writer.release()
+    return encoded, video_path
+
+
+def create_random_model(work_dir):
+    """构建随机初始化的小模型并保存为 .pt，供检测核心按路径加载"""
+    from ultralytics import YOLO
+    path = os.path.join(work_dir, "random_model.pt")
+    YOLO(RANDOM_MODEL_CFG).save(path)
+    return path
+
+
+def bench_images(timer, engine, encoded_images):
+    """单张图片路径上的各阶段：解码、前处理 / 推理 / NMS（取自 ultralytics 计时）、Top-K、绘制、格式化"""
+    from detection_results import format_results
+    all_detections = []
+    for index, data in enumerate(encoded_images):
+        with timer.measure("image_decode"):
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        result = engine.predict(frame)[0]
+        timer.add("preprocess", result.speed["preprocess"])
+        timer.add("inference", result.speed["inference"])
+        timer.add("nms", result.speed["postprocess"])
+        with timer.measure("top_k"):
+            engine.filter_top_k_boxes(result)
+        with timer.measure("plot"):
+            result.plot()
+        with timer.measure("extract"):
+            detections = engine.extract_detections(result, f"image_{index}", index)
+        with timer.measure("format"):
+            format_results(detections)
+        all_detections.append(detections)
+    return all_detections
+
+
+def bench_video_decode(timer, video_path):
+    cap = cv2.VideoCapture(video_path)
+    while True:
+        with timer.measure("video_decode"):
+            ok, _ = cap.read()
+        if not ok:
+            # 最后一次读取失败不计入样本
+            timer.samples["video_decode"].pop()
+            break
+    cap.release()
+
+
+def bench_video_pipeline(timer, engine_factory, video_path):
+    """完整视频流水线（解码 -> 推理 -> 绘制）的每帧平均耗时"""
+    from detection_core import PACING_FAST
+    engine = engine_factory('video', video_path, pacing_mode=PACING_FAST)
+    start = time.perf_counter()
+    engine.run()
+    elapsed = (time.perf_counter() - start) * 1000
+    if engine.processed_frames:
+        timer.add("video_pipeline", elapsed / engine.processed_frames)
+
+
+def bench_signal_delivery(timer, payloads):
+    """检测线程发出 Qt 信号到界面线程槽函数执行的延迟（未安装 PyQt6 时跳过）"""
+    try:
+        from PyQt6.QtCore import QCoreApplication, QObject, pyqtSignal, pyqtSlot
+    except ImportError:
+        print("PyQt6 not available, skipping signal delivery benchmark.")
+        return
+
+    class _Emitter(QObject):
+        detections_signal = pyqtSignal(object)
+
+    class _Receiver(QObject):
+        def __init__(self):
+            super().__init__()
+            self.received = 0
+
+        @pyqtSlot(object)
+        def on_detections(self, item):
+            sent_at, _ = item
+            timer.add("signal", (time.perf_counter() - sent_at) * 1000)
+            self.received += 1
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+    emitter, receiver = _Emitter(), _Receiver()
+    emitter.detections_signal.connect(receiver.on_detections)
+
+    def emit_all():
+        for detections in payloads:
+            emitter.detections_signal.emit((time.perf_counter(), detections))
+            time.sleep(0.001)
+
+    # 从另一个线程发出，与检测线程到界面线程的排队连接一致
+    sender = threading.Thread(target=emit_all)
+    sender.start()
+    deadline = time.monotonic() + 30
+    while receiver.received < len(payloads) and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.0005)
+    sender.join()
+
+
+def bench_db_writes(timer, frame_count, boxes_per_frame, batch_rows=500):
+    """按后台写入器的批量大小把逐帧检测明细写入临时数据库（在临时工作目录中，不影响正式数据库）"""
+    import database
+    from detection_results import FrameDetections
+    # 即使 database 模块已在别处导入，也改为写入当前（临时）目录下的独立数据库
+    original_db_file = database.DB_FILE
+    database.close_db_connection()
+    database.DB_FILE = os.path.abspath("benchmark.db")
+    database.create_tables()
+    history_id = database.add_history_record('video', 'benchmark', "benchmark")
+    rng = np.random.default_rng(1)
+    labels = {cls: f"{cls}-class{cls}" for cls in range(7)}
+    rows = []
+    for frame_id in range(frame_count):
+        boxes = rng.random((boxes_per_frame, 6), dtype=np.float32)
+        boxes[:, 0] = rng.integers(0, 7, boxes_per_frame)
+        detections = FrameDetections(frame_id, "video_frame", boxes, labels, frame_id / 25)
+        rows.extend(database.DetectionRecorder._to_rows(history_id, detections))
+    for start in range(0, len(rows), batch_rows):
+        with timer.measure("db_write"):
+            database.add_detections(rows[start:start + batch_rows])
+    database.close_db_connection()
+    database.DB_FILE = original_db_file
+
+
+def run_benchmark(model_path=None, images=32, frames=60, width=640, height=480, conf=None, iou=0.45, top_k=4,
+                  skip=()):
+    """在临时工作目录中运行全部阶段，返回 JSON 可序列化的结果"""
+    timer = StageTimer()
+    model_path = os.path.abspath(model_path) if model_path else None
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="yolo_bench_") as work_dir:
+        os.chdir(work_dir)
+        try:
+            from detection_core import DetectionEngine
+            if model_path is None:
+                model_path = create_random_model(work_dir)
+                model_label = f"random {RANDOM_MODEL_CFG}"
+                conf = RANDOM_MODEL_CONF if conf is None else conf
+            else:
+                model_label = model_path
+                conf = 0.25 if conf is None else conf
+
+            def engine_factory(source_type, source_path, **options):
+                return DetectionEngine(model_path, source_type, source_path, conf, iou, top_k=top_k, **options)
+
+            encoded_images, video_path = generate_inputs(work_dir, images, frames, width, height)
+            engine = engine_factory('image', None)
+            if not engine.load_model():
+                raise RuntimeError(engine.error)
+
+            # 预热一轮（首次绘制需加载字体等），不计入结果
+            bench_images(StageTimer(), engine, encoded_images[:1])
+            detections = bench_images(timer, engine, encoded_images)
+            bench_video_decode(timer, video_path)
+            if "video_pipeline" not in skip:
+                bench_video_pipeline(timer, engine_factory, video_path)
+            if "signal" not in skip:
+                bench_signal_delivery(timer, detections)
+            if "db_write" not in skip:
+                bench_db_writes(timer, frames * 25, top_k)
+        finally:
+            os.chdir(original_dir)
+
+    import torch
+    import ultralytics
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "ultralytics": ultralytics.__version__,
+            "model": model_label,
+            "images": images,
+            "frames": frames,
+            "image_size": [width, height],
+            "conf": conf,
+            "iou": iou,
+            "top_k": top_k,
+        },
+        "stages": timer.summary(),
+    }
+
+
+def compare_with_baseline(current, baseline, threshold=DEFAULT_THRESHOLD, stage_thresholds=None,
+                          min_delta_ms=MIN_DELTA_MS):
+    """逐阶段比较中位数耗时，返回 (报告行列表, 退化的阶段列表)"""
+    stage_thresholds = stage_thresholds or {}
+    lines = [f"{'stage':<16}{'baseline ms':>14}{'current ms':>14}{'change':>10}  status"]
+    regressions = []
+    for stage in STAGES:
+        base = baseline["stages"].get(stage)
+        cur = current["stages"].get(stage)
+        if base is None or cur is None:
+            continue
+        base_ms, cur_ms = base["median_ms"], cur["median_ms"]
+        change = (cur_ms - base_ms) / base_ms if base_ms > 0 else 0.0
+        limit = stage_thresholds.get(stage, threshold)
+        regressed = change > limit and cur_ms - base_ms > min_delta_ms
+        if regressed:
+            regressions.append(stage)
+        status = f"REGRESSION (> {limit:.0%})" if regressed else "ok"
+        lines.append(f"{stage:<16}{base_ms:>14.3f}{cur_ms:>14.3f}{change:>+10.1%}  {status}")
+    return lines, regressions
+
+
+def format_summary(result):
+    lines = [f"{'stage':<16}{'count':>7}{'median ms':>12}{'mean ms':>12}{'p95 ms':>12}"]
+    for stage, stats in result["stages"].items():
+        lines.append(f"{stage:<16}{stats['count']:>7}{stats['median_ms']:>12.3f}"
+                     f"{stats['mean_ms']:>12.3f}{stats['p95_ms']:>12.3f}")
+    return lines
+
+
+def _parse_stage_thresholds(values):
+    thresholds = {}
+    for value in values or []:
+        stage, _, limit = value.partition("=")
+        if stage not in STAGES or not limit:
+            raise argparse.ArgumentTypeError(f"Invalid stage threshold: {value}")
+        thresholds[stage] = float(limit)
+    return thresholds
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Per-stage performance benchmark for the detection core")
+    parser.add_argument("--model", help="Model weights (default: randomly initialised yolo11n, runs offline)")
+    parser.add_argument("--images", type=int, default=32, help="Number of synthetic images")
+    parser.add_argument("--frames", type=int, default=60, help="Number of synthetic video frames")
+    parser.add_argument("--width", type=int, default=640, help="Synthetic input width")
+    parser.add_argument("--height", type=int, default=480, help="Synthetic input height")
+    parser.add_argument("--conf", type=float, help="Confidence threshold (default depends on the model)")
+    parser.add_argument("--top-k", type=int, default=4, help="Boxes kept per frame")
+    parser.add_argument("--skip", nargs="*", default=[], choices=["video_pipeline", "signal", "db_write"],
+                        help="Optional stages to skip")
+    parser.add_argument("--output", default="benchmark_result.json", help="Where to save the results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown of the median per stage (0.2 = 20%%)")
+    parser.add_argument("--stage-threshold", nargs="*", metavar="STAGE=RATIO",
+                        help="Per-stage overrides, e.g. plot=0.5 signal=1.0")
+    parser.add_argument("--update-baseline", action="store_true", help="Save this run as the new baseline")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        stage_thresholds = _parse_stage_thresholds(args.stage_threshold)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    result = run_benchmark(args.model, images=args.images, frames=args.frames, width=args.width,
+                           height=args.height, conf=args.conf, top_k=args.top_k, skip=set(args.skip))
+    print("\n".join(format_summary(result)))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    lines, regressions = compare_with_baseline(result, baseline, args.threshold, stage_thresholds)
+    print("\n".join(lines))
+    if regressions:
+        print(f"Performance regression in: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
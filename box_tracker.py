@@ -0,0 +1,171 @@
+# box_tracker.py
+# 轻量多目标跟踪：每隔 N 帧运行一次检测，中间帧用金字塔 LK 光流平移检测框，并为每个目标分配稳定的跟踪 ID；
+# 本模块不导入 PyQt6
+import cv2
+import numpy as np
+
+from detection_results import iou_matrix
+
+# 默认每隔多少帧运行一次检测（1 表示每帧检测、不使用跟踪）
+DEFAULT_DETECT_INTERVAL = 5
+# 跟踪置信度（成功跟踪的特征点比例的中位数）低于该值时提前运行检测
+MIN_TRACK_CONFIDENCE = 0.5
+# 检测框与已有轨迹关联所需的最小 IoU（同类别）
+MATCH_IOU = 0.3
+# 轨迹在检测帧中连续未被关联的次数超过该值后删除；未关联期间继续传播但不输出
+MAX_MISSES = 1
+# 每个检测框内最多取多少个角点，以及前向-后向光流误差上限（像素）
+MAX_POINTS_PER_BOX = 20
+MAX_FB_ERROR = 1.0
+# 光流计算前把画面缩小到不超过该宽度，坐标结果再按比例还原
+FLOW_MAX_WIDTH = 960
+
+_LK_PARAMS = dict(winSize=(21, 21), maxLevel=3,
+                  criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+
+class _Track:
+    __slots__ = ("track_id", "box", "conf", "cls", "misses")
+
+    def __init__(self, track_id, box, conf, cls):
+        self.track_id = track_id
+        self.box = box
+        self.conf = conf
+        self.cls = cls
+        self.misses = 0
+
+
+class BoxTracker:
+    """
+    检测帧调用 update() 关联检测框与轨迹（同类别按 IoU 贪心匹配，未匹配的检测框开启新轨迹）；
+    中间帧调用 propagate() 用光流整体平移各轨迹的框，返回 False 表示已到检测间隔或跟踪置信度过低、应重新检测。
+    """
+
+    def __init__(self, detect_interval=DEFAULT_DETECT_INTERVAL, min_confidence=MIN_TRACK_CONFIDENCE):
+        self.detect_interval = max(1, int(detect_interval))
+        self.min_confidence = min_confidence
+        self._tracks = []
+        self._next_id = 1
+        self._prev_gray = None
+        self._scale = 1.0
+        self._frames_since_detection = 0
+        # 最近一次传播的跟踪置信度，以及检测 / 传播的帧数统计
+        self.confidence = 1.0
+        self.detected_frames = 0
+        self.propagated_frames = 0
+
+    def _gray(self, frame):
+        h, w = frame.shape[:2]
+        self._scale = min(1.0, FLOW_MAX_WIDTH / w)
+        if self._scale < 1.0:
+            frame = cv2.resize(frame, (int(w * self._scale), int(h * self._scale)), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+    def update(self, frame, data):
+        """检测帧：data 为 (N, 6) 数组，列为 x1, y1, x2, y2, conf, cls（原图坐标）"""
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        boxes = data[:, :4]
+        matched_tracks, matched_dets = set(), set()
+        if self._tracks and len(data):
+            ious = iou_matrix(np.array([t.box for t in self._tracks]), boxes)
+            same_class = np.array([t.cls for t in self._tracks])[:, None] == data[None, :, 5]
+            ious = np.where(same_class, ious, 0.0)
+            for flat in np.argsort(-ious, axis=None):
+                i, j = np.unravel_index(flat, ious.shape)
+                if ious[i, j] < MATCH_IOU:
+                    break
+                if i in matched_tracks or j in matched_dets:
+                    continue
+                matched_tracks.add(i)
+                matched_dets.add(j)
+                track = self._tracks[i]
+                track.box, track.conf, track.misses = boxes[j].copy(), float(data[j, 4]), 0
+
+        tracks = []
+        for i, track in enumerate(self._tracks):
+            if i not in matched_tracks:
+                track.misses += 1
+                if track.misses > MAX_MISSES:
+                    continue
+            tracks.append(track)
+        for j in range(len(data)):
+            if j not in matched_dets:
+                tracks.append(_Track(self._next_id, boxes[j].copy(), float(data[j, 4]), int(data[j, 5])))
+                self._next_id += 1
+        self._tracks = tracks
+        self._prev_gray = self._gray(frame)
+        self._frames_since_detection = 0
+        self.confidence = 1.0
+        self.detected_frames += 1
+
+    def propagate(self, frame):
+        """中间帧：用光流平移各轨迹的框；需要重新检测时返回 False（此时不修改轨迹）"""
+        if self._prev_gray is None or self._frames_since_detection + 1 >= self.detect_interval:
+            return False
+        gray = self._gray(frame)
+        if gray.shape != self._prev_gray.shape:
+            return False
+
+        # 在每个框内部取角点，所有轨迹的点合并为一次前向 + 一次后向光流计算
+        point_sets, owners = [], []
+        for index, track in enumerate(self._tracks):
+            points = self._box_points(track.box * self._scale)
+            if points is not None:
+                point_sets.append(points)
+                owners.extend([index] * len(points))
+        shifts = {}
+        if point_sets:
+            prev_points = np.concatenate(point_sets)
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, prev_points, None, **_LK_PARAMS)
+            back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, next_points, None,
+                                                                   **_LK_PARAMS)
+            fb_error = np.linalg.norm((prev_points - back_points).reshape(-1, 2), axis=1)
+            good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < MAX_FB_ERROR)
+            motion = (next_points - prev_points).reshape(-1, 2)
+            owners = np.array(owners)
+            ratios = []
+            for index in range(len(self._tracks)):
+                mine = owners == index
+                total = np.count_nonzero(mine)
+                if total == 0:
+                    continue
+                ok = mine & good
+                ratios.append(np.count_nonzero(ok) / total)
+                if np.count_nonzero(ok) >= 3:
+                    shifts[index] = np.median(motion[ok], axis=0) / self._scale
+            self.confidence = float(np.median(ratios)) if ratios else 1.0
+        else:
+            self.confidence = 1.0
+        if self.confidence < self.min_confidence:
+            return False
+
+        height, width = frame.shape[:2]
+        for index, (dx, dy) in shifts.items():
+            box = self._tracks[index].box + np.array([dx, dy, dx, dy], dtype=np.float32)
+            self._tracks[index].box = np.clip(box, 0, [width, height, width, height]).astype(np.float32)
+        self._prev_gray = gray
+        self._frames_since_detection += 1
+        self.propagated_frames += 1
+        return True
+
+    def _box_points(self, box):
+        x1, y1, x2, y2 = np.round(box).astype(int)
+        h, w = self._prev_gray.shape
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        corners = cv2.goodFeaturesToTrack(self._prev_gray[y1:y2, x1:x2], MAX_POINTS_PER_BOX, 0.01, 3)
+        if corners is None:
+            # 无纹理的区域退化为规则网格采样
+            xs, ys = np.meshgrid(np.linspace(x1 + 1, x2 - 2, 4), np.linspace(y1 + 1, y2 - 2, 4))
+            return np.stack([xs.ravel(), ys.ravel()], axis=1).astype(np.float32).reshape(-1, 1, 2)
+        return (corners + np.array([x1, y1], dtype=np.float32)).astype(np.float32)
+
+    def boxes(self):
+        """当前输出的轨迹，(N, 7) 数组：x1, y1, x2, y2, track_id, conf, cls（与 ultralytics 跟踪结果格式一致）"""
+        visible = [t for t in self._tracks if t.misses == 0]
+        data = np.zeros((len(visible), 7), dtype=np.float32)
+        for row, track in enumerate(visible):
+            data[row, :4] = track.box
+            data[row, 4:] = (track.track_id, track.conf, track.cls)
+        return data
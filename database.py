@@ -2,16 +2,82 @@
 import sqlite3
 import hashlib
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
 DB_FILE = "yolo11sxswApp.db"
+# 数据库被其他连接锁定时的最长等待时间（毫秒）
+BUSY_TIMEOUT_MS = 5000
+
+# 每个线程持有一个长连接，避免每次操作都重新打开数据库
+_local = threading.local()
+# 已完成建表检查的数据库文件：首次建立连接时才建表，导入本模块不访问磁盘
+_initialized_files = set()
+_init_lock = threading.Lock()
 
 def get_db_connection():
-    """建立并返回数据库连接"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
+    """返回当前线程的长连接（首次调用时建立并配置：WAL 日志、NORMAL 同步级别、忙等待超时）"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.row_factory = sqlite3.Row
+        # WAL 模式下读写互不阻塞；NORMAL 同步级别在 WAL 下仍能保证数据库一致性，且只在检查点时 fsync
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        _local.conn = conn
+        _local.tx_depth = 0
+        _ensure_tables()
     return conn
 
+def _ensure_tables():
+    """每个数据库文件在进程内只执行一次建表检查"""
+    db_path = os.path.abspath(DB_FILE)
+    with _init_lock:
+        if db_path in _initialized_files:
+            return
+        _initialized_files.add(db_path)
+        try:
+            create_tables()
+        except sqlite3.Error:
+            _initialized_files.discard(db_path)
+            raise
+
+def close_db_connection():
+    """关闭当前线程的长连接（线程退出前调用）"""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def transaction():
+    """
+    批量写入接口：在同一个事务中执行多次写入，只提交（fsync）一次。
+    可以嵌套使用，内层的写入会合并到最外层事务中。
+    """
+    conn = get_db_connection()
+    depth = _local.tx_depth
+    _local.tx_depth = depth + 1
+    try:
+        yield conn
+        if depth == 0:
+            conn.commit()
+    except Exception:
+        if depth == 0:
+            conn.rollback()
+        raise
+    finally:
+        _local.tx_depth = depth
+
+def execute_many(sql, rows):
+    """在一个事务中批量执行同一条插入/更新语句"""
+    with transaction() as conn:
+        conn.executemany(sql, rows)
+
 def create_tables():
     """
     检查并创建所有需要的数据库表。
@@ -40,6 +106,8 @@ def create_tables():
             result_summary TEXT
         );
     """)
+    # 历史页面按时间倒序分页读取（键集分页），需要 (detection_time, id) 索引
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_time ON detection_history (detection_time, id);")
     
     # ---【新增部分】---
     print("检查并创建 feedback 表...")
@@ -54,8 +122,32 @@ def create_tables():
     """)
     # -------------------
 
+    # 逐帧检测明细：视频/摄像头会话中每一帧的每个检测框一行
+    print("检查并创建 detections 表...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS detections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            history_id INTEGER NOT NULL REFERENCES detection_history(id),
+            frame_idx INTEGER NOT NULL,
+            timestamp REAL,
+            class_id INTEGER NOT NULL,
+            class_label TEXT,
+            conf REAL NOT NULL,
+            x_center REAL NOT NULL,
+            y_center REAL NOT NULL,
+            width REAL NOT NULL,
+            height REAL NOT NULL,
+            track_id INTEGER
+        );
+    """)
+    # 旧版本创建的 detections 表没有 track_id 列（启用跟踪时的目标 ID，未跟踪时为 NULL）
+    columns = {row["name"] for row in cursor.execute("PRAGMA table_info(detections)")}
+    if "track_id" not in columns:
+        cursor.execute("ALTER TABLE detections ADD COLUMN track_id INTEGER;")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_history_frame ON detections (history_id, frame_idx);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_class ON detections (class_id);")
+
     conn.commit()
-    conn.close()
     print("数据库表初始化完成。")
 
 
@@ -67,25 +159,18 @@ def add_user(username, password):
     """添加新用户，对密码进行哈希存储"""
     if not username or not password:
         return False, "用户名或密码不能为空"
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
-                       (username, hash_password(password)))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                         (username, hash_password(password)))
         return True, "注册成功"
     except sqlite3.IntegrityError:
         return False, "用户名已存在"
-    finally:
-        conn.close()
 
 def check_user(username, password):
     """验证用户名和密码"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
     if user and user['password_hash'] == hash_password(password):
         return True
     return False
@@ -93,87 +178,201 @@ def check_user(username, password):
 def update_password(username, new_password):
     """根据用户名更新密码"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
+    user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
     if not user:
-        conn.close()
         return False, "该用户名不存在"
     try:
-        cursor.execute("UPDATE users SET password_hash = ? WHERE username = ?",
-                       (hash_password(new_password), username))
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute("UPDATE users SET password_hash = ? WHERE username = ?",
+                         (hash_password(new_password), username))
         return True, "密码重置成功！"
     except sqlite3.Error as e:
-        conn.close()
         return False, f"数据库更新失败: {e}"
 
 def add_history_record(detection_type, source_path, result_summary=""):
     """向历史记录表中添加一条新记录, 并返回该记录的ID"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     last_id = None
     try:
-        cursor.execute("""
-            INSERT INTO detection_history (detection_type, source_path, detection_time, result_summary)
-            VALUES (?, ?, ?, ?)
-        """, (detection_type, source_path, current_time, result_summary))
-        conn.commit()
-        last_id = cursor.lastrowid
+        with transaction() as conn:
+            cursor = conn.execute("""
+                INSERT INTO detection_history (detection_type, source_path, detection_time, result_summary)
+                VALUES (?, ?, ?, ?)
+            """, (detection_type, source_path, current_time, result_summary))
+            last_id = cursor.lastrowid
     except sqlite3.Error as e:
         print(f"添加历史记录失败: {e}")
-    finally:
-        conn.close()
     return last_id
 
 def update_history_summary(record_id, summary):
     """根据记录ID更新结果摘要"""
     if not record_id:
         return
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE detection_history SET result_summary = ? WHERE id = ?", (summary, record_id))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("UPDATE detection_history SET result_summary = ? WHERE id = ?", (summary, record_id))
     except sqlite3.Error as e:
         print(f"更新历史记录失败: {e}")
-    finally:
-        conn.close()
 
 def get_all_history():
     """从历史记录表中获取所有记录，按时间倒序排列"""
     conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT * FROM detection_history ORDER BY detection_time DESC")
-        records = cursor.fetchall()
-        return records
+        return conn.execute("SELECT * FROM detection_history ORDER BY detection_time DESC").fetchall()
     except sqlite3.Error as e:
         print(f"查询历史记录失败: {e}")
         return []
-    finally:
-        conn.close()
+
+def add_detections(rows):
+    """批量写入逐帧检测明细，rows 中每项为
+    (history_id, frame_idx, timestamp, class_id, class_label, conf, x_center, y_center, width, height, track_id)，
+    frame_idx 从 0 开始（视频与摄像头一致），未跟踪时 track_id 为 None"""
+    execute_many("""
+        INSERT INTO detections (history_id, frame_idx, timestamp, class_id, class_label,
+                                conf, x_center, y_center, width, height, track_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+def get_detections(history_id, start_frame=None, end_frame=None):
+    """查询某条历史记录的逐帧检测明细，可按帧范围过滤"""
+    conn = get_db_connection()
+    sql = "SELECT * FROM detections WHERE history_id = ?"
+    params = [history_id]
+    if start_frame is not None:
+        sql += " AND frame_idx >= ?"
+        params.append(start_frame)
+    if end_frame is not None:
+        sql += " AND frame_idx <= ?"
+        params.append(end_frame)
+    sql += " ORDER BY frame_idx"
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        print(f"查询检测明细失败: {e}")
+        return []
+
+class DetectionRecorder:
+    """
+    逐帧检测明细的后台写入线程：检测循环只需把结果放入队列，
+    由本线程攒批后用 executemany 在一个事务中写入，不拖慢检测。
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_rows=500, flush_interval=1.0):
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, history_id, detections):
+        """提交一帧检测结果（FrameDetections），可在任意线程调用"""
+        if history_id is None or len(detections) == 0:
+            return
+        self._queue.put((history_id, detections))
+
+    def pending(self):
+        """队列中尚未写入的帧数"""
+        return self._queue.qsize()
+
+    def close(self):
+        """写完队列中剩余的数据后停止线程"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _run(self):
+        pending = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is self._STOP:
+                break
+            if item is not None:
+                pending.extend(self._to_rows(*item))
+            now = time.monotonic()
+            if len(pending) >= self.batch_rows or (pending and now - last_flush >= self.flush_interval):
+                self._flush(pending)
+                pending = []
+                last_flush = now
+        self._flush(pending)
+        close_db_connection()
+
+    @staticmethod
+    def _to_rows(history_id, detections):
+        track_ids = detections.track_ids
+        return [
+            (history_id, detections.frame_id, detections.timestamp, int(box[0]), detections.label(row),
+             float(box[1]), float(box[2]), float(box[3]), float(box[4]), float(box[5]),
+             int(track_ids[row]) if track_ids is not None else None)
+            for row, box in enumerate(detections.boxes)
+        ]
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        try:
+            add_detections(rows)
+        except sqlite3.Error as e:
+            print(f"写入检测明细失败: {e}")
+
+def get_history_page(before=None, limit=200, summary_chars=200):
+    """
+    键集分页读取历史记录（按时间倒序）。
+    before 为上一页最后一行的 (detection_time, id)，为 None 时读取第一页；
+    结果摘要只截取前 summary_chars 个字符，避免读取超长的文件夹汇总；summary_length 为完整摘要的长度，
+    完整内容按需通过 get_history_summary() 读取。
+    """
+    conn = get_db_connection()
+    sql = """
+        SELECT id, detection_type, source_path, detection_time,
+               substr(result_summary, 1, ?) AS result_summary,
+               length(result_summary) AS summary_length
+        FROM detection_history
+    """
+    params = [summary_chars]
+    if before is not None:
+        sql += " WHERE (detection_time, id) < (?, ?)"
+        params.extend(before)
+    sql += " ORDER BY detection_time DESC, id DESC LIMIT ?"
+    params.append(limit)
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        print(f"查询历史记录失败: {e}")
+        return []
+
+def get_history_summary(record_id):
+    """读取某条历史记录的完整结果摘要，记录不存在时返回 None"""
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT result_summary FROM detection_history WHERE id = ?", (record_id,)).fetchone()
+    except sqlite3.Error as e:
+        print(f"查询历史记录失败: {e}")
+        return None
+    return row["result_summary"] if row else None
 
 # ---【新增函数】---
 def add_feedback(feedback_type, content, contact_info=""):
     """向反馈表中添加一条新记录"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
-        cursor.execute("""
-            INSERT INTO feedback (feedback_type, content, contact_info, submission_time)
-            VALUES (?, ?, ?, ?)
-        """, (feedback_type, content, contact_info, current_time))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("""
+                INSERT INTO feedback (feedback_type, content, contact_info, submission_time)
+                VALUES (?, ?, ?, ?)
+            """, (feedback_type, content, contact_info, current_time))
         return True # 返回成功标志
     except sqlite3.Error as e:
         print(f"添加反馈失败: {e}")
         return False # 返回失败标志
-    finally:
-        conn.close()
 # --------------------
-
-create_tables()
\ No newline at end of file
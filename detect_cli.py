@@ -0,0 +1,203 @@
+# detect_cli.py
+# 无界面命令行入口：在服务器上对图片 / 文件夹 / 视频 / 摄像头 / 多路视频流执行检测，本模块不导入 PyQt6
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import threading
+import time
+
+from detection_core import DetectionEngine, IMAGE_EXTENSIONS, DEFAULT_TOP_K, PACING_FAST, PACING_SOURCE_FPS
+from detection_results import BOX_COLUMNS
+from result_cache import ResultCache, CACHE_DB_FILE
+from adaptive_resolution import format_resolution
+from motion_gate import DEFAULT_MAX_SKIP
+from video_exporter import POLICY_BLOCK, POLICY_DROP
+from tiled_inference import DEFAULT_TILE_OVERLAP, MERGE_NMS, MERGE_WBF
+from telemetry import METRICS_LOG_FILE
+from model_backends import log_to_stderr
+
+
+def guess_source_type(source):
+    """根据输入自动判断检测类型"""
+    if source.isdigit():
+        return 'camera'
+    if os.path.isdir(source):
+        return 'folder'
+    if os.path.splitext(source.lower())[1] in IMAGE_EXTENSIONS:
+        return 'image'
+    return 'video'
+
+
+class ResultWriter:
+    """把每帧检测结果流式写入 JSON Lines 或 CSV（"-" 表示标准输出）"""
+
+    CSV_HEADER = ["frame_id", "image_id", "label"] + list(BOX_COLUMNS)
+
+    def __init__(self, output_path, output_format, with_track_ids=False):
+        """with_track_ids：启用跟踪时在 CSV 末尾增加 track_id 列（JSON Lines 中有跟踪 ID 时自动输出）"""
+        self.output_format = output_format
+        self.with_track_ids = with_track_ids
+        self._file = sys.stdout if output_path == "-" else open(output_path, "w", newline="", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._csv = None
+        if output_format == "csv":
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.CSV_HEADER + (["track_id"] if with_track_ids else []))
+
+    def write(self, detections):
+        with self._lock:
+            if self._csv is not None:
+                for row in range(len(detections)):
+                    track_cell = []
+                    if self.with_track_ids:
+                        track_cell = [int(detections.track_ids[row]) if detections.track_ids is not None else ""]
+                    self._csv.writerow(
+                        [detections.frame_id, detections.image_id, detections.label(row)]
+                        + [int(detections.boxes[row, 0])]
+                        + [round(float(v), 4) for v in detections.boxes[row, 1:]]
+                        + track_cell
+                    )
+            else:
+                record = {
+                    "frame_id": detections.frame_id,
+                    "image_id": detections.image_id,
+                    "detections": [
+                        {
+                            "class_id": int(box[0]),
+                            "label": detections.label(row),
+                            "conf": round(float(box[1]), 4),
+                            "x_center": round(float(box[2]), 4),
+                            "y_center": round(float(box[3]), 4),
+                            "width": round(float(box[4]), 4),
+                            "height": round(float(box[5]), 4),
+                        }
+                        for row, box in enumerate(detections.boxes)
+                    ],
+                }
+                if detections.track_ids is not None:
+                    for item, track_id in zip(record["detections"], detections.track_ids):
+                        item["track_id"] = int(track_id)
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless YOLO container damage detection")
+    parser.add_argument("source", nargs="+",
+                        help="Image file, image folder, video file or camera index; "
+                             "several cameras/videos run as one batched multi-stream detection")
+    parser.add_argument("--model", required=True, help="Path to the YOLO model weights")
+    parser.add_argument("--type", dest="source_type", choices=["auto", "image", "folder", "video", "camera", "multi"],
+                        default="auto", help="Source type (default: detect from source)")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold")
+    parser.add_argument("--iou", type=float, default=0.45, help="IoU threshold for NMS")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Boxes kept per frame")
+    parser.add_argument("--batch-size", type=int, default=8, help="Batch size for folder detection")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for folder detection (1: in-process, 0: one per core pair)")
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="PyTorch threads per worker process (0: auto)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="With --workers, write folder results as soon as each chunk finishes")
+    parser.add_argument("--tile-size", type=int, default=0,
+                        help="Detect images in overlapping tiles of this size in pixels (0: whole image)")
+    parser.add_argument("--tile-overlap", type=float, default=DEFAULT_TILE_OVERLAP,
+                        help="Overlap ratio between neighbouring tiles")
+    parser.add_argument("--tile-merge", choices=[MERGE_NMS, MERGE_WBF], default=MERGE_NMS,
+                        help="How boxes are merged across tile seams")
+    parser.add_argument("--target-fps", type=float, default=0,
+                        help="Adapt the input size to hold this inference FPS for video/camera (0: off)")
+    parser.add_argument("--motion-threshold", type=float, default=0,
+                        help="Skip inference on video/camera frames with less than this percentage of changed "
+                             "pixels, reusing the previous result (0: off)")
+    parser.add_argument("--motion-max-skip", type=int, default=DEFAULT_MAX_SKIP,
+                        help="With --motion-threshold, force inference after this many skipped frames")
+    parser.add_argument("--detect-every", type=int, default=1, metavar="N",
+                        help="Run the detector every N video/camera frames and track boxes in between, "
+                             "reporting stable track IDs (1: detect every frame)")
+    parser.add_argument("--pace", action="store_true", help="Pace video processing to the source FPS")
+    parser.add_argument("--cache", nargs="?", const=CACHE_DB_FILE, metavar="FILE",
+                        help=f"Reuse cached image results (default cache file: {CACHE_DB_FILE})")
+    parser.add_argument("--metrics-log", nargs="?", const=METRICS_LOG_FILE, metavar="FILE",
+                        help=f"Write rolling performance metrics (default file: {METRICS_LOG_FILE})")
+    parser.add_argument("--export", metavar="FILE",
+                        help="Save the annotated video/camera output to FILE (.mp4/.avi) "
+                             "with YOLO labels in FILE_labels/")
+    parser.add_argument("--export-policy", choices=[POLICY_BLOCK, POLICY_DROP],
+                        help="When the encoder falls behind: block inference or drop export frames "
+                             "(default: block for videos, drop for cameras)")
+    parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument("--format", dest="output_format", choices=["jsonl", "csv"],
+                        help="Output format (default: from output extension, else jsonl)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    log_to_stderr()
+    source_type = args.source_type
+    if source_type == "auto":
+        source_type = "multi" if len(args.source) > 1 else guess_source_type(args.source[0])
+    if source_type != "multi" and len(args.source) > 1:
+        print(f"Error: --type {source_type} accepts a single source.", file=sys.stderr)
+        return 2
+    source = args.source if source_type == "multi" else args.source[0]
+    if args.export and source_type not in ("video", "camera"):
+        print("Error: --export is only supported for video and camera sources.", file=sys.stderr)
+        return 2
+    output_format = args.output_format
+    if output_format is None:
+        output_format = "csv" if args.output.lower().endswith(".csv") else "jsonl"
+
+    engine = DetectionEngine(args.model, source_type, source, args.conf, args.iou,
+                             batch_size=args.batch_size,
+                             pacing_mode=PACING_SOURCE_FPS if args.pace else PACING_FAST,
+                             top_k=args.top_k, annotate=bool(args.export),
+                             result_cache=ResultCache(args.cache) if args.cache else None,
+                             pool_workers=args.workers, pool_threads=args.threads_per_worker,
+                             pool_ordered=not args.unordered, target_fps=args.target_fps,
+                             metrics_log=args.metrics_log, motion_threshold=args.motion_threshold / 100,
+                             motion_max_skip=args.motion_max_skip, detect_interval=args.detect_every,
+                             export_path=args.export, export_policy=args.export_policy,
+                             tile_size=args.tile_size or None, tile_overlap=args.tile_overlap,
+                             tile_merge=args.tile_merge)
+    writer = ResultWriter(args.output, output_format, with_track_ids=args.detect_every > 1)
+    engine.on_detections = writer.write
+    engine.on_message = lambda text: print(text, file=sys.stderr)
+    engine.on_resolution = lambda stats: print(format_resolution(stats), file=sys.stderr)
+
+    # 检测在后台线程运行，主线程负责响应 Ctrl+C 以便摄像头等无尽输入能正常停止；
+    # 运行期间的日志打印转到标准错误，保证标准输出只包含检测结果
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):
+        worker = threading.Thread(target=engine.run, daemon=True)
+        worker.start()
+        try:
+            while worker.is_alive():
+                worker.join(timeout=0.2)
+        except KeyboardInterrupt:
+            print("Interrupted, stopping detection...", file=sys.stderr)
+            engine.stop()
+            worker.join()
+    elapsed = time.perf_counter() - start_time
+    writer.close()
+
+    fps = engine.processed_frames / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {engine.processed_frames} frames, {engine.detection_count} detections "
+          f"in {elapsed:.2f}s ({fps:.2f} frames/s)", file=sys.stderr)
+    if engine.motion_gate is not None:
+        print(engine.motion_gate.summary(), file=sys.stderr)
+    if args.detect_every > 1:
+        print(f"Tracked {len(engine.track_counter)} unique targets:\n{engine.track_counter.format()}", file=sys.stderr)
+    return 1 if engine.error else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,904 @@
+# detection_core.py
+# 与界面无关的检测核心：图形界面（yolo_detector.py）与命令行（detect_cli.py）共用，本模块不得导入 PyQt6
+import cv2
+import os
+import queue
+import threading
+import time
+import numpy as np
+import torch
+from collections import deque
+from ultralytics.engine.results import Results
+from model_registry import get_model, get_model_lock, get_registry
+from frame_grabber import LatestFrameGrabber
+from detection_results import FrameDetections, TrackCounter, empty_boxes, format_results
+from inference_pool import InferencePool
+from adaptive_resolution import ResolutionController
+from motion_gate import MotionGate, DEFAULT_MAX_SKIP
+from box_tracker import BoxTracker
+from video_exporter import VideoExporter, POLICY_BLOCK, POLICY_DROP
+from tiled_inference import (tile_windows, is_blank_tile, seam_tiles, merge_boxes, DEFAULT_TILE_OVERLAP, MERGE_NMS)
+from telemetry import MetricsCollector, get_metrics_logger, log_metrics
+
+# 视频播放节奏：尽可能快 / 按视频源帧率
+PACING_FAST = 'fast'
+PACING_SOURCE_FPS = 'source_fps'
+# 视频流水线各阶段之间的队列长度
+PIPELINE_QUEUE_SIZE = 8
+# 流水线结束标记
+_END_OF_STREAM = object()
+
+# 摄像头统计信息的发送间隔（秒）
+CAMERA_STATS_INTERVAL = 1.0
+
+# 每帧保留的检测框数量（置信度最高的前K个）默认值
+DEFAULT_TOP_K = 4
+
+# -----------------------------------------------需修改：定义类别与ID的映射关系--------------------------------------------------
+CLASS_ID_MAP = {"hole": 0, "broken": 1, "rusty": 2, "scratch": 3, "sd": 4, "hd": 5, "vd": 6}
+# ---------------------------------------------------------------------------------------------------------------------------
+
+# 文件夹检测支持的图片格式
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
+
+# 多路检测时网格中每路画面的尺寸 (宽, 高)，以及所有流暂无新帧时的等待间隔（秒）
+GRID_TILE_SIZE = (640, 360)
+STREAM_IDLE_WAIT = 0.005
+
+
+def build_class_labels(class_names):
+    """根据模型类别名构建 类别索引 -> "映射ID-类别名" 的显示标签（模型加载后只需构建一次）"""
+    # 未在映射表中的类别沿用模型自身的类别索引
+    return {cls: f"{CLASS_ID_MAP.get(name, cls)}-{name}" for cls, name in class_names.items()}
+
+
+def list_image_files(folder_path):
+    """列出文件夹内的所有图片文件（按文件名排序）"""
+    return [
+        os.path.join(folder_path, f)
+        for f in sorted(os.listdir(folder_path))
+        if os.path.splitext(f.lower())[1] in IMAGE_EXTENSIONS
+    ]
+
+
+def parse_stream_sources(text):
+    """解析多路输入：逗号或分号分隔的摄像头编号 / 视频文件路径"""
+    return [part.strip() for part in text.replace(";", ",").split(",") if part.strip()]
+
+
+def stream_names(sources):
+    """为每一路输入生成显示名：摄像头为 cam<编号>，视频为文件名；重名时追加序号"""
+    names = []
+    for source in sources:
+        base = f"cam{source}" if source.isdigit() else os.path.splitext(os.path.basename(source))[0]
+        name, suffix = base, 2
+        while name in names:
+            name = f"{base}#{suffix}"
+            suffix += 1
+        names.append(name)
+    return names
+
+
+def compose_grid(tiles, names, tile_size=GRID_TILE_SIZE):
+    """把各路画面等比缩放到统一尺寸并拼成网格（尚无画面的位置为黑色），左上角标注流名称"""
+    tile_w, tile_h = tile_size
+    cols = int(np.ceil(np.sqrt(len(tiles))))
+    rows = int(np.ceil(len(tiles) / cols))
+    grid = np.zeros((rows * tile_h, cols * tile_w, 3), dtype=np.uint8)
+    for index, (tile, name) in enumerate(zip(tiles, names)):
+        y, x = (index // cols) * tile_h, (index % cols) * tile_w
+        if tile is not None:
+            h, w = tile.shape[:2]
+            scale = min(tile_w / w, tile_h / h)
+            new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
+            off_x, off_y = (tile_w - new_w) // 2, (tile_h - new_h) // 2
+            grid[y + off_y:y + off_y + new_h, x + off_x:x + off_x + new_w] = cv2.resize(
+                tile, (new_w, new_h), interpolation=cv2.INTER_AREA)
+        cv2.putText(grid, name, (x + 8, y + 24), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+    return grid
+
+
+def _ignore(*args):
+    pass
+
+
+class DetectionEngine:
+    """检测核心：加载模型并处理图片 / 文件夹 / 视频 / 摄像头，结果通过回调函数输出
+
+    回调（均可为空）：
+        on_frame(annotated_frame)     标注后的画面（BGR）
+        on_detections(detections)     每帧的结构化检测结果（FrameDetections）
+        on_message(text)              状态/错误提示文本
+        on_progress(done, total)      文件夹检测进度
+        on_finished(summary)          检测完成后的 markdown 汇总
+        on_camera_stats(stats)        摄像头丢帧、延迟统计
+        on_resolution(stats)          自适应分辨率：当前 imgsz、目标帧率与推理耗时
+        on_metrics(snapshot)          约每秒一次的性能指标快照（帧率、各阶段耗时、队列深度等）
+    """
+
+    def __init__(self, model_path, source_type, source_path, conf_threshold, iou_threshold, batch_size=8,
+                 pacing_mode=PACING_SOURCE_FPS, top_k=DEFAULT_TOP_K, annotate=True, imgsz=None, result_cache=None,
+                 pool_workers=1, pool_threads=0, pool_ordered=True, target_fps=None,
+                 metrics_log=None, motion_threshold=None, motion_max_skip=DEFAULT_MAX_SKIP, detect_interval=1,
+                 export_path=None, export_policy=None, tile_size=None, tile_overlap=DEFAULT_TILE_OVERLAP,
+                 tile_merge=MERGE_NMS):
+        self.model_path = model_path
+        self.source_type = source_type
+        self.source_path = source_path
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.batch_size = max(1, int(batch_size))
+        self.pacing_mode = pacing_mode
+        self.top_k = max(1, int(top_k))
+        # 无界面运行且不需要输出画面时可关闭绘制，省去 plot() 开销（导出标注视频时始终绘制）
+        self.annotate = annotate or bool(export_path)
+        # 推理输入尺寸，None 表示使用模型默认值
+        self.imgsz = imgsz
+        # 图片推理结果缓存（ResultCache），为 None 时不使用缓存
+        self.result_cache = result_cache
+        # 文件夹检测的多进程推理池：进程数为 1 时在本线程内推理，0 表示按 CPU 核心数自动选择；
+        # pool_threads 为每个进程的 PyTorch 线程数（0 为自动），pool_ordered 决定结果是否按文件顺序返回
+        self.pool_workers = pool_workers
+        self.pool_threads = pool_threads
+        self.pool_ordered = pool_ordered
+        # 视频 / 摄像头的目标推理帧率，设置后按实测耗时自动调整 imgsz；None 或 0 表示固定分辨率
+        self.target_fps = target_fps
+        # 视频 / 摄像头的运动门控：变化像素占比（0~1）低于 motion_threshold 的帧不推理、复用上一次结果，
+        # 最多连续跳过 motion_max_skip 帧；None 或 0 表示每帧都推理
+        self.motion_threshold = motion_threshold
+        self.motion_max_skip = motion_max_skip
+        self.motion_gate = None
+        self._gated_boxes = None
+        # 视频 / 摄像头每隔 detect_interval 帧检测一次，中间帧由跟踪器传播检测框（1 表示每帧检测）；
+        # track_counter 按跟踪 ID 汇总出现过的目标
+        self.detect_interval = max(1, int(detect_interval))
+        self.track_counter = TrackCounter()
+        # 视频 / 摄像头的标注视频导出路径（同时写 YOLO 标签），None 表示不导出；
+        # export_policy 为编码跟不上时的策略，None 时视频文件阻塞等待、摄像头丢帧
+        self.export_path = export_path
+        self.export_policy = export_policy
+        self.exporter = None
+        # 图片 / 文件夹的切片推理：图块边长（像素，None 或 0 表示整图推理）、重叠比例与跨图块合并方式（NMS / WBF）
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_merge = tile_merge
+        self.model = None
+        self.model_lock = None
+        self.class_labels = {}
+        self.is_running = True
+        self.camera_stats = {}
+        # 多路检测结束时各路的汇总 {流名称: 汇总文本}
+        self.stream_summaries = {}
+        self.error = None
+        # 吞吐统计：已处理帧数与检测框总数
+        self.processed_frames = 0
+        self.detection_count = 0
+        # 滚动性能指标；metrics_log 为指标日志文件路径，None 表示不写日志
+        self.metrics = MetricsCollector()
+        self.metrics_logger = get_metrics_logger(metrics_log) if metrics_log else None
+
+        self.on_frame = _ignore
+        self.on_detections = _ignore
+        self.on_message = _ignore
+        self.on_progress = _ignore
+        self.on_finished = _ignore
+        self.on_camera_stats = _ignore
+        self.on_resolution = _ignore
+        self.on_metrics = _ignore
+
+    def load_model(self):
+        """从进程级注册表获取模型，仅在首次使用或权重文件变化时才真正加载；失败时返回 False"""
+        try:
+            self.model = get_model(self.model_path)
+            self.model_lock = get_model_lock(self.model)
+            self.class_labels = build_class_labels(self.model.names)
+            load_time = get_registry().load_time(self.model_path)
+            if load_time is not None:
+                self.metrics.set_gauge("model_load_s", load_time)
+            print("YOLO model ready.")
+            return True
+        except Exception as e:
+            print(f"Error: Unable to load model {self.model_path}. Error: {e}")
+            self.fail(f"Model loading failed: {e}")
+            return False
+
+    def run(self):
+        """加载模型并按检测类型处理输入源；出错时返回 False，错误信息保存在 self.error"""
+        # 多进程文件夹检测时模型只在工作进程中加载
+        if not self.uses_pool() and not self.load_model():
+            return False
+
+        if self.source_type == 'image':
+            self.process_image()
+        elif self.source_type == 'folder':
+            self.process_folder()
+        elif self.source_type == 'video':
+            self.process_video()
+        elif self.source_type == 'camera':
+            self.process_camera()
+        elif self.source_type == 'multi':
+            self.process_streams()
+        else:
+            self.fail(f"Error: Unknown source type {self.source_type}.")
+        self.publish_metrics(force=True)
+        return self.error is None
+
+    def stop(self):
+        self.is_running = False
+
+    def uses_pool(self):
+        return self.source_type == 'folder' and self.pool_workers != 1
+
+    def fail(self, message):
+        self.error = message
+        self.on_message(message)
+
+    def predict(self, source):
+        """以当前参数调用模型推理，source 可以是单帧或帧列表"""
+        kwargs = {"conf": self.conf_threshold, "iou": self.iou_threshold, "verbose": False}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        # 同一模型实例可能被多个线程共享（如后台预取），预测器本身不是线程安全的
+        with self.model_lock:
+            results = self.model(source, **kwargs)
+        if results:
+            # ultralytics 自带的分阶段计时（批量推理时为每张图的平均值）
+            speed = results[0].speed
+            self.metrics.record("preprocess", speed["preprocess"])
+            self.metrics.record("inference", speed["inference"])
+            self.metrics.record("nms", speed["postprocess"])
+        return results
+
+    def publish_metrics(self, force=False):
+        """到达发送间隔（或 force）时输出一次指标快照，并按需写入指标日志"""
+        if not force and not self.metrics.due():
+            return
+        snapshot = self.metrics.snapshot()
+        self.on_metrics(snapshot)
+        if self.metrics_logger is not None:
+            log_metrics(self.metrics_logger, self.source_type, snapshot)
+
+    def create_resolution_controller(self):
+        """按目标帧率创建分辨率控制器，未设置目标帧率时返回 None"""
+        if not self.target_fps:
+            return None
+        controller = ResolutionController(self.target_fps, initial_imgsz=self.imgsz)
+        self.on_resolution(controller.stats())
+        return controller
+
+    def predict_adaptive(self, frame, controller):
+        """以控制器选定的 imgsz 推理单帧，并把实测耗时反馈给控制器"""
+        if controller is None:
+            return self.predict(frame)
+        self.imgsz = controller.imgsz
+        start = time.perf_counter()
+        results = self.predict(frame)
+        if controller.update(time.perf_counter() - start):
+            self.on_resolution(controller.stats())
+        return results
+
+    def start_exporter(self, fps, default_policy):
+        """按需启动标注视频导出线程"""
+        if not self.export_path:
+            return
+        try:
+            self.exporter = VideoExporter(self.export_path, fps, self.export_policy or default_policy).start()
+        except OSError as e:
+            self.on_message(f"Video export disabled: {e}")
+            return
+        self.on_message(f"Exporting annotated video to {self.export_path}")
+
+    def finish_exporter(self):
+        """写完剩余帧并关闭导出文件，返回导出摘要（未导出时为空字符串）"""
+        if self.exporter is None:
+            return ""
+        exporter, self.exporter = self.exporter, None
+        exporter.close()
+        if exporter.error is not None:
+            self.on_message(exporter.error)
+            return exporter.error
+        summary = exporter.summary()
+        self.on_message(summary)
+        return summary
+
+    def create_motion_gate(self):
+        """按运动阈值创建门控，未设置阈值时返回 None"""
+        if not self.motion_threshold:
+            return None
+        # 保留最近一次创建的门控，检测结束后可读取跳过统计
+        self.motion_gate = MotionGate(self.motion_threshold, self.motion_max_skip)
+        return self.motion_gate
+
+    def predict_gated(self, frame, controller, gate):
+        """
+        推理单帧并返回结果对象；画面相对上一次推理没有明显变化时不调用模型，
+        用上一次推理的检测框（Top-K 筛选前）和当前画面构造结果，后续绘制与输出流程不变。
+        """
+        gate_start = time.perf_counter()
+        run_model = gate is None or gate.check(frame)
+        if gate is not None:
+            self.metrics.record("motion_gate", (time.perf_counter() - gate_start) * 1000)
+            self.metrics.set_gauge("skipped_frames", gate.skipped_frames)
+            self.metrics.set_gauge("skip_ratio", round(gate.skip_ratio(), 3))
+        if run_model:
+            result = self.predict_adaptive(frame, controller)[0]
+            self._gated_boxes = result.boxes.data
+            return result
+        return Results(frame, path="image0.jpg", names=self.model.names, boxes=self._gated_boxes)
+
+    def create_tracker(self):
+        """按检测间隔创建跟踪器，每帧检测时返回 None"""
+        if self.detect_interval <= 1:
+            return None
+        return BoxTracker(self.detect_interval)
+
+    def predict_tracked(self, frame, controller, gate, tracker):
+        """
+        跟踪模式下处理单帧：未到检测间隔且跟踪置信度足够时只用光流传播上一帧的框，否则运行检测并与已有轨迹关联。
+        返回带跟踪 ID 的结果对象；未启用跟踪时等同于 predict_gated()。
+        """
+        if tracker is None:
+            return self.predict_gated(frame, controller, gate)
+        track_start = time.perf_counter()
+        if tracker.propagate(frame):
+            self.metrics.record("track", (time.perf_counter() - track_start) * 1000)
+        else:
+            result = self.predict_gated(frame, controller, gate)
+            # 只跟踪最终会输出的 Top-K 框，跟踪开销与低置信度框的数量无关
+            self.filter_top_k_boxes(result)
+            track_start = time.perf_counter()
+            tracker.update(frame, result.boxes.data.cpu().numpy())
+            self.metrics.record("track", (time.perf_counter() - track_start) * 1000)
+        self.metrics.set_gauge("tracked_frames", tracker.propagated_frames)
+        self.metrics.set_gauge("track_confidence", round(tracker.confidence, 2))
+        return Results(frame, path="image0.jpg", names=self.model.names, boxes=torch.from_numpy(tracker.boxes()))
+
+    def infer_image_files(self, paths, frame_indices=None):
+        """
+        对一批图片文件推理，返回 [(路径, 结果)]，无法读取的图片被跳过。
+        启用结果缓存时，命中的图片不经过模型，由缓存的检测框直接重建结果；未命中的图片合并为一个批次推理。
+        frame_indices 为需要绘制的图片下标集合：命中缓存时只解码这些图片，其余只用缓存的原图尺寸
+        （None 表示开启绘制时全部解码）；之后需要绘制其他结果时用 ensure_frame() 补解码。
+        """
+        outputs = [None] * len(paths)
+        miss_indices, miss_frames, miss_keys = [], [], []
+        for i, path in enumerate(paths):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                print(f"Warning: Unable to read image {path}, skipped. Error: {e}")
+                continue
+
+            key = cached = None
+            if self.result_cache is not None:
+                key = self.result_cache.make_key(data, self.model_path, self.conf_threshold,
+                                                 self.iou_threshold, self.imgsz, self.tiling_variant())
+                cached = self.result_cache.get(key)
+                needs_frame = self.annotate and (frame_indices is None or i in frame_indices)
+                if cached is not None and not needs_frame:
+                    # 不需要绘制的图片连解码也可省去
+                    outputs[i] = self._result_from_cache(None, path, cached)
+                    continue
+
+            decode_start = time.perf_counter()
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            self.metrics.record("decode", (time.perf_counter() - decode_start) * 1000)
+            if frame is None:
+                print(f"Warning: Unable to decode image {path}, skipped.")
+                continue
+            if cached is not None:
+                outputs[i] = self._result_from_cache(frame, path, cached)
+                continue
+            miss_indices.append(i)
+            miss_frames.append(frame)
+            miss_keys.append(key)
+
+        if miss_frames:
+            if self.tile_size:
+                results = [self.predict_tiled(frame) for frame in miss_frames]
+            else:
+                results = self.predict(miss_frames)
+            for i, key, result in zip(miss_indices, miss_keys, results):
+                result.path = paths[i]
+                if key is not None:
+                    # 缓存 Top-K 筛选前的全部检测框，修改 K 后缓存依然有效
+                    self.result_cache.put(key, result.boxes.data.cpu().numpy(), result.orig_shape)
+                outputs[i] = result
+        return [(paths[i], result) for i, result in enumerate(outputs) if result is not None]
+
+    def ensure_frame(self, result):
+        """由缓存重建且未解码原图的结果在绘制前补上原图"""
+        if result.orig_img.shape[:2] == tuple(result.orig_shape):
+            return result
+        decode_start = time.perf_counter()
+        frame = cv2.imread(result.path)
+        self.metrics.record("decode", (time.perf_counter() - decode_start) * 1000)
+        if frame is not None:
+            result.orig_img = frame
+        return result
+
+    def tiling_variant(self):
+        """切片推理参数的文本描述（用于结果缓存键），整图推理时为 None"""
+        if not self.tile_size:
+            return None
+        return f"tiles:{self.tile_size}:{self.tile_overlap:.3f}:{self.tile_merge}"
+
+    def tile_options(self):
+        """切片推理参数（传给多进程推理池与预取中新建的检测引擎）"""
+        return {"tile_size": self.tile_size, "tile_overlap": self.tile_overlap, "tile_merge": self.tile_merge}
+
+    def predict_tiled(self, frame):
+        """
+        切片推理单张图片：无内容的图块跳过，其余图块按 batch_size 分批推理，检测框平移回原图坐标；
+        另外推理一次整图以保留跨越多个图块的大目标，最后按类别跨接缝合并。返回与整图推理格式相同的结果对象。
+        """
+        height, width = frame.shape[:2]
+        all_windows = tile_windows(width, height, self.tile_size, self.tile_overlap)
+        if len(all_windows) == 1:
+            return self.predict(frame)[0]
+        windows = [window for window in all_windows
+                   if not is_blank_tile(frame[window[1]:window[3], window[0]:window[2]])]
+        self.metrics.set_gauge("tiles", len(windows))
+        self.metrics.set_gauge("tiles_skipped", len(all_windows) - len(windows))
+
+        full_boxes = self.predict(frame)[0].boxes.data.cpu().numpy()
+        # 整图推理的框不属于任何图块（接缝序号 -1），与图块的框之间只按 IoU 合并
+        all_boxes, all_seams = [full_boxes], [np.full(len(full_boxes), -1, dtype=np.int64)]
+        for start in range(0, len(windows), self.batch_size):
+            batch = windows[start:start + self.batch_size]
+            results = self.predict([frame[y1:y2, x1:x2] for x1, y1, x2, y2 in batch])
+            for offset, ((x1, y1, _, _), result) in enumerate(zip(batch, results)):
+                boxes = result.boxes.data.cpu().numpy().copy()
+                boxes[:, [0, 2]] += x1
+                boxes[:, [1, 3]] += y1
+                all_boxes.append(boxes)
+                all_seams.append(seam_tiles(boxes, start + offset, windows))
+
+        merge_start = time.perf_counter()
+        merged = merge_boxes(np.concatenate(all_boxes), self.tile_merge, np.concatenate(all_seams))
+        self.metrics.record("tile_merge", (time.perf_counter() - merge_start) * 1000)
+        return Results(frame, path="image0.jpg", names=self.model.names, boxes=torch.from_numpy(merged))
+
+    def _result_from_cache(self, frame, path, cached):
+        """由缓存的检测框重建 YOLO 结果对象，后续筛选、绘制、格式化流程与模型输出完全一致"""
+        boxes, orig_shape = cached
+        orig_img = frame if frame is not None else np.zeros((1, 1, 3), dtype=np.uint8)
+        result = Results(orig_img, path=path, names=self.model.names, boxes=torch.from_numpy(boxes))
+        if frame is None:
+            # 未解码图片时只需原图尺寸即可计算归一化坐标
+            result.orig_shape = orig_shape
+        return result
+
+    def filter_top_k_boxes(self, result):
+        """筛选置信度前K的检测框（在设备端一次 topk 完成，不逐框取值）"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) <= self.top_k:
+            return
+        top_indices = boxes.conf.topk(self.top_k).indices
+        result.boxes = boxes[top_indices]
+
+    def build_output(self, result, image_id, frame_id, timestamp=None):
+        """生成一帧的输出：标注画面（关闭绘制时为 None）与结构化检测结果"""
+        annotated_frame = None
+        if self.annotate:
+            plot_start = time.perf_counter()
+            annotated_frame = result.plot()
+            self.metrics.record("plot", (time.perf_counter() - plot_start) * 1000)
+        extract_start = time.perf_counter()
+        detections = self.extract_detections(result, image_id, frame_id, timestamp)
+        self.metrics.record("extract", (time.perf_counter() - extract_start) * 1000)
+        return annotated_frame, detections
+
+    def emit_output(self, annotated_frame, detections):
+        self.processed_frames += 1
+        self.detection_count += len(detections)
+        if annotated_frame is not None:
+            if self.exporter is not None:
+                self.exporter.write(annotated_frame, detections)
+                self.metrics.set_gauge("export_queue", self.exporter.pending())
+                self.metrics.set_gauge("export_dropped", self.exporter.dropped_frames)
+            self.on_frame(annotated_frame)
+        self.on_detections(detections)
+        self.metrics.count_frame()
+        self.publish_metrics()
+
+    def emit_result(self, result, image_id, frame_id, timestamp=None):
+        """输出一帧结果：标注画面（按需）与结构化检测结果"""
+        annotated_frame, detections = self.build_output(result, image_id, frame_id, timestamp)
+        self.emit_output(annotated_frame, detections)
+        return detections
+
+    def detect_image_file(self, path, frame_id=0):
+        """检测单张图片文件，返回 (标注画面, 检测结果)；图片无法读取时返回 None"""
+        outputs = self.infer_image_files([path])
+        if not outputs:
+            return None
+        _, result = outputs[0]
+        self.filter_top_k_boxes(result)
+        image_id = os.path.splitext(os.path.basename(path))[0]
+        return self.build_output(result, image_id, frame_id)
+
+    def process_image(self):
+        output = self.detect_image_file(self.source_path)
+        if output is None:
+            self.fail("Error: Unable to read image file.")
+            return
+        annotated_frame, detections = output
+        self.emit_output(annotated_frame, detections)
+        self.on_finished(format_results(detections))
+
+    def process_folder(self):
+        """整文件夹批量检测：按批次送入模型，逐张输出结果，结束时汇总全部结果"""
+        image_paths = list_image_files(self.source_path)
+        total = len(image_paths)
+        if total == 0:
+            self.fail("Error: No valid image files found in the folder.")
+            return
+
+        all_detections = []
+        done = 0
+        self.on_progress(0, total)
+        pool = batches = None
+        try:
+            if self.uses_pool():
+                pool = InferencePool(self.model_path, self.conf_threshold, self.iou_threshold, self.top_k,
+                                     imgsz=self.imgsz, annotate=self.annotate, result_cache=self.result_cache,
+                                     workers=self.pool_workers, threads_per_worker=self.pool_threads,
+                                     ordered=self.pool_ordered, tile_options=self.tile_options())
+                print(f"Folder detection with {pool.workers} processes x {pool.threads_per_worker} threads.")
+                batches = pool.run(image_paths, self.batch_size)
+            else:
+                batches = self._folder_batches(image_paths)
+
+            for batch_count, batch_detections, annotated_frame in batches:
+                for detections in batch_detections:
+                    self.processed_frames += 1
+                    self.detection_count += len(detections)
+                    all_detections.append(detections)
+                    self.on_detections(detections)
+                    self.metrics.count_frame()
+                # 每个批次只刷新一次画面，避免大量图像堆积在界面事件队列中
+                if annotated_frame is not None:
+                    self.on_frame(annotated_frame)
+
+                done += batch_count
+                self.on_progress(done, total)
+                self.publish_metrics()
+                if not self.is_running:
+                    break
+        except Exception as e:
+            self.fail(f"Folder detection failed: {e}")
+        finally:
+            if batches is not None:
+                batches.close()
+            if pool is not None:
+                # 中途停止时直接终止仍在推理的进程
+                pool.close(wait=self.is_running and self.error is None)
+
+        # 全部完成后才生成markdown汇总；无目标时结果文本中不含图片ID，汇总时补上
+        summaries = [
+            format_results(d) if len(d) else f"{d.image_id}: {format_results(d)}"
+            for d in all_detections
+        ]
+        final_summary = f"Folder detection finished: {done}/{total} images.\n" + "\n\n".join(summaries)
+        self.on_finished(final_summary)
+
+    def _folder_batches(self, image_paths):
+        """在本线程内按批次推理，产出 (批次图片数, [FrameDetections], 标注画面或 None)"""
+        for start in range(0, len(image_paths), self.batch_size):
+            batch_paths = image_paths[start:start + self.batch_size]
+            frame_ids = {path: start + offset for offset, path in enumerate(batch_paths)}
+            # 自行解码后以列表形式送入模型，一次前向完成整个批次（命中缓存的图片不参与推理）
+            # 每个批次只绘制最后一张，命中缓存的其余图片无需解码
+            outputs = self.infer_image_files(batch_paths, frame_indices={len(batch_paths) - 1})
+            batch_detections = []
+            for path, result in outputs:
+                self.filter_top_k_boxes(result)
+                image_id = os.path.splitext(os.path.basename(path))[0]
+                batch_detections.append(self.extract_detections(result, image_id, frame_ids[path]))
+            annotated_frame = self.ensure_frame(outputs[-1][1]).plot() if outputs and self.annotate else None
+            yield len(batch_paths), batch_detections, annotated_frame
+
+    def process_video(self):
+        """流水线式视频检测：解码线程 -> 推理（本线程）-> 绘制线程，阶段之间通过有界队列衔接"""
+        cap = cv2.VideoCapture(self.source_path)
+        if not cap.isOpened():
+            self.fail("Error: Unable to open video file.")
+            return
+
+        source_fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        # 视频文件默认阻塞等待编码，导出的视频不丢帧
+        self.start_exporter(source_fps, POLICY_BLOCK)
+        decode_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        render_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        self.last_detections = None
+
+        decoder = threading.Thread(target=self._decode_stage, args=(cap, decode_queue), daemon=True)
+        renderer = threading.Thread(target=self._render_stage, args=(render_queue, source_fps), daemon=True)
+        decoder.start()
+        renderer.start()
+
+        # 推理阶段：吞吐量只受模型本身限制
+        controller = self.create_resolution_controller()
+        gate = self.create_motion_gate()
+        tracker = self.create_tracker()
+        # 绘制线程异常退出后不再继续推理
+        while self.is_running and renderer.is_alive():
+            item = self._queue_get(decode_queue)
+            if item is _END_OF_STREAM:
+                break
+            frame_idx, frame = item
+            self.metrics.set_gauge("decode_queue", decode_queue.qsize())
+            self.metrics.set_gauge("render_queue", render_queue.qsize())
+            result = self.predict_tracked(frame, controller, gate, tracker)
+            if not self._queue_put(render_queue, (frame_idx, result)):
+                break
+        self._queue_put(render_queue, _END_OF_STREAM)
+
+        decoder.join()
+        renderer.join()
+        cap.release()
+        export_summary = self.finish_exporter()
+
+        if self.is_running:
+            last_result_text = format_results(self.last_detections) if self.last_detections is not None else ""
+            final_summary = "Video processing completed.\n" + last_result_text
+            if gate is not None:
+                final_summary += "\n\n" + gate.summary()
+            if tracker is not None:
+                final_summary += (f"\n\nTracked targets ({len(self.track_counter)} unique, detector ran on "
+                                  f"{tracker.detected_frames} frames):\n" + self.track_counter.format())
+            if export_summary:
+                final_summary += "\n\n" + export_summary
+            self.on_message("Video processing completed.")
+            self.on_finished(final_summary)
+
+    def _decode_stage(self, cap, decode_queue):
+        """解码阶段：持续读取视频帧，队列满时阻塞等待推理阶段消费"""
+        frame_idx = 0
+        while self.is_running:
+            decode_start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self.metrics.record("decode", (time.perf_counter() - decode_start) * 1000)
+            if not self._queue_put(decode_queue, (frame_idx, frame)):
+                break
+            frame_idx += 1
+        self._queue_put(decode_queue, _END_OF_STREAM)
+
+    def _render_stage(self, render_queue, source_fps):
+        """绘制阶段线程入口：绘制或导出出错时记录错误并停止检测，避免推理阶段一直等待队列"""
+        try:
+            self._render_frames(render_queue, source_fps)
+        except Exception as e:
+            self.fail(f"Video rendering failed: {e}")
+            self.stop()
+
+    def _render_frames(self, render_queue, source_fps):
+        """绘制阶段：筛选检测框、绘制标注并输出结果，可按源帧率控制节奏"""
+        pace_to_source = self.pacing_mode == PACING_SOURCE_FPS and source_fps > 0
+        start_time = None
+        while True:
+            item = self._queue_get(render_queue)
+            if item is _END_OF_STREAM:
+                break
+            frame_idx, result = item
+            self.filter_top_k_boxes(result)
+            # 视频帧的时间戳为其在视频中的位置（秒）
+            timestamp = frame_idx / source_fps if source_fps > 0 else None
+            annotated_frame, detections = self.build_output(result, "video_frame", frame_idx, timestamp)
+
+            if pace_to_source:
+                # 以第一帧为基准，按 帧序号/帧率 计算每帧的输出时刻
+                if start_time is None:
+                    start_time = time.perf_counter() - frame_idx / source_fps
+                delay = start_time + frame_idx / source_fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            self.emit_output(annotated_frame, detections)
+            self.track_counter.update(detections)
+            self.last_detections = detections
+
+    def _queue_get(self, q):
+        """从队列读取数据；检测被停止时返回结束标记"""
+        while self.is_running:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END_OF_STREAM
+
+    def _queue_put(self, q, item):
+        """向有界队列写入数据；检测被停止时放弃写入并返回 False"""
+        while self.is_running:
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def process_camera(self):
+        try:
+            camera_index = int(self.source_path)
+        except ValueError:
+            camera_index = self.source_path
+
+        cap = cv2.VideoCapture(camera_index)
+        if not cap.isOpened():
+            self.fail("Error: Unable to open camera.")
+            return
+        # 尽量减小驱动层缓冲（部分后端不支持，忽略返回值）
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        # 摄像头默认在编码跟不上时丢弃导出帧，不拖慢实时检测；导出按采集时间戳补帧，回放速度与实际一致
+        self.start_exporter(cap.get(cv2.CAP_PROP_FPS), POLICY_DROP)
+        # 后台线程持续取帧，推理总是处理最新一帧
+        grabber = LatestFrameGrabber(cap).start()
+        latencies = deque(maxlen=120)
+        processed_frames = 0
+        last_stats_time = time.perf_counter()
+        controller = self.create_resolution_controller()
+        gate = self.create_motion_gate()
+        tracker = self.create_tracker()
+
+        while self.is_running:
+            item = grabber.read(timeout=1.0)
+            if item is None:
+                if grabber.failed:
+                    self.fail("Error: Unable to read frame from camera.")
+                    break
+                continue
+            frame_id, frame, capture_time = item
+
+            result = self.predict_tracked(frame, controller, gate, tracker)
+            self.filter_top_k_boxes(result)
+            # 把采集时刻换算为 Unix 时间，作为该帧的时间戳
+            capture_timestamp = time.time() - (time.perf_counter() - capture_time)
+            detections = self.emit_result(result, "camera_frame", frame_id, capture_timestamp)
+            self.track_counter.update(detections)
+
+            # 采集 -> 输出显示 的端到端延迟
+            latencies.append((time.perf_counter() - capture_time) * 1000)
+            self.metrics.record("capture_to_output", latencies[-1])
+            self.metrics.set_gauge("captured_frames", grabber.captured_frames)
+            self.metrics.set_gauge("dropped_frames", grabber.dropped_frames)
+            processed_frames += 1
+            now = time.perf_counter()
+            if now - last_stats_time >= CAMERA_STATS_INTERVAL:
+                self.camera_stats = {
+                    "captured_frames": grabber.captured_frames,
+                    "dropped_frames": grabber.dropped_frames,
+                    "processed_frames": processed_frames,
+                    "latency_ms_avg": sum(latencies) / len(latencies),
+                    "latency_ms_max": max(latencies),
+                    "skipped_frames": gate.skipped_frames if gate is not None else 0,
+                }
+                self.on_camera_stats(dict(self.camera_stats))
+                last_stats_time = now
+
+        grabber.stop()
+        cap.release()
+        print("Camera released.")
+        self.finish_exporter()
+
+    def process_streams(self):
+        """
+        多路检测：source_path 为摄像头编号 / 视频文件列表。摄像头（以及按源帧率播放的视频）由独立线程
+        只保留最新一帧；每轮把各路的最新帧合并为一个批次推理（共享同一个模型），再把各路标注画面拼成网格输出。
+        PACING_FAST 模式下视频文件不丢帧，每轮直接各读一帧。
+        """
+        sources = list(self.source_path)
+        names = stream_names(sources)
+        caps, grabbers, stream_fps = [], [], []
+        for source, name in zip(sources, names):
+            is_camera = source.isdigit()
+            cap = cv2.VideoCapture(int(source) if is_camera else source)
+            if not cap.isOpened():
+                cap.release()
+                self._release_streams(caps, grabbers)
+                self.fail(f"Error: Unable to open stream {name} ({source}).")
+                return
+            fps = 0.0
+            if is_camera:
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            else:
+                fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            grabber = None
+            if is_camera or self.pacing_mode == PACING_SOURCE_FPS:
+                # 视频文件按源帧率实时读取，模拟直播流；推理跟不上时只处理最新一帧
+                grabber = LatestFrameGrabber(cap, None if is_camera or fps <= 0 else fps).start()
+            caps.append(cap)
+            grabbers.append(grabber)
+            stream_fps.append(fps)
+
+        tiles = [None] * len(caps)
+        frame_counts = [0] * len(caps)
+        finished = [False] * len(caps)
+        last_detections = {}
+        while self.is_running and not all(finished):
+            batch = []
+            for index, (cap, grabber) in enumerate(zip(caps, grabbers)):
+                if finished[index]:
+                    continue
+                if grabber is None:
+                    decode_start = time.perf_counter()
+                    ret, frame = cap.read()
+                    if ret:
+                        self.metrics.record("decode", (time.perf_counter() - decode_start) * 1000)
+                        batch.append((index, frame_counts[index], frame, decode_start))
+                        frame_counts[index] += 1
+                        continue
+                else:
+                    item = grabber.read(timeout=0)
+                    if item is not None:
+                        batch.append((index,) + item)
+                        continue
+                    if not grabber.failed:
+                        continue
+                finished[index] = True
+                self.on_message(f"Stream {names[index]} ended.")
+            if not batch:
+                time.sleep(STREAM_IDLE_WAIT)
+                continue
+
+            self.metrics.set_gauge("streams_in_batch", len(batch))
+            results = self.predict([frame for _, _, frame, _ in batch])
+            for (index, frame_idx, _, capture_time), result in zip(batch, results):
+                self.filter_top_k_boxes(result)
+                if stream_fps[index] > 0:
+                    timestamp = frame_idx / stream_fps[index]
+                else:
+                    timestamp = time.time() - (time.perf_counter() - capture_time)
+                annotated_frame, detections = self.build_output(result, names[index], frame_idx, timestamp)
+                tiles[index] = annotated_frame
+                last_detections[names[index]] = detections
+                self.processed_frames += 1
+                self.detection_count += len(detections)
+                self.on_detections(detections)
+                self.metrics.count_frame()
+            if self.annotate:
+                self.on_frame(compose_grid(tiles, names))
+            self.metrics.set_gauge("dropped_frames", sum(g.dropped_frames for g in grabbers if g is not None))
+            self.publish_metrics()
+
+        self._release_streams(caps, grabbers)
+        if self.is_running:
+            # 各路单独的汇总（写入各自的历史记录），on_finished 收到所有路合并后的汇总
+            self.stream_summaries = {
+                name: f"{name}: {format_results(last_detections[name])}" for name in names if name in last_detections
+            }
+            summary = "\n\n".join(self.stream_summaries.values())
+            self.on_message("Multi-stream detection completed.")
+            self.on_finished("Multi-stream detection completed.\n" + summary)
+
+    @staticmethod
+    def _release_streams(caps, grabbers):
+        for grabber in grabbers:
+            if grabber is not None:
+                grabber.stop()
+        for cap in caps:
+            cap.release()
+
+    def extract_detections(self, result, image_id, frame_id, timestamp=None):
+        """把YOLO结果转换为结构化记录（归一化坐标）"""
+        if result.boxes is None or len(result.boxes) == 0:
+            return FrameDetections(frame_id, image_id, empty_boxes(), self.class_labels, timestamp)
+
+        # 一次性把整个检测框张量拷贝到主机：列为 x1, y1, x2, y2, [track_id,] conf, cls
+        raw = result.boxes.data.cpu().numpy()
+        orig_height, orig_width = result.orig_shape  # YOLO的orig_shape返回(高, 宽)
+        x1, y1, x2, y2 = raw[:, 0], raw[:, 1], raw[:, 2], raw[:, 3]
+
+        data = np.empty((len(raw), 6), dtype=np.float32)
+        data[:, 0] = raw[:, -1]
+        data[:, 1] = raw[:, -2]
+        data[:, 2] = (x1 + x2) / 2 / orig_width
+        data[:, 3] = (y1 + y2) / 2 / orig_height
+        data[:, 4] = (x2 - x1) / orig_width
+        data[:, 5] = (y2 - y1) / orig_height
+        track_ids = raw[:, 4].astype(np.int64) if raw.shape[1] == 7 else None
+        return FrameDetections(frame_id, image_id, data, self.class_labels, timestamp, track_ids)
@@ -0,0 +1,115 @@
+# detection_results.py
+import numpy as np
+
+# boxes 数组的列定义
+BOX_COLUMNS = ("class_id", "conf", "x_center", "y_center", "width", "height")
+
+NO_TARGET_TEXT = "No target detected in the current frame."
+
+
+class FrameDetections:
+    """单帧结构化检测结果
+
+    boxes 为 (N, 6) 的 float32 数组，列依次为 class_id, conf, x_center, y_center, width, height，
+    坐标已按原图宽高归一化；class_labels 把模型类别索引映射为显示用的 "映射ID-类别名"；
+    timestamp 为视频内的时间位置（秒）或摄像头采集时刻（Unix 时间），图片为 None；
+    track_ids 为启用跟踪时与 boxes 逐行对应的跟踪 ID（int 数组），未跟踪时为 None。
+    """
+
+    __slots__ = ("frame_id", "image_id", "boxes", "class_labels", "timestamp", "track_ids")
+
+    def __init__(self, frame_id, image_id, boxes, class_labels, timestamp=None, track_ids=None):
+        self.frame_id = frame_id
+        self.image_id = image_id
+        self.boxes = boxes
+        self.class_labels = class_labels
+        self.timestamp = timestamp
+        self.track_ids = track_ids
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def label(self, row):
+        return self.class_labels[int(self.boxes[row, 0])]
+
+
+def empty_boxes():
+    return np.zeros((0, len(BOX_COLUMNS)), dtype=np.float32)
+
+
+def iou_matrix(a, b):
+    """两组 xyxy 框之间的 IoU 矩阵（跟踪关联与量化对比共用）"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def format_results(detections):
+    """生成markdown格式的检测结果表格（仅在保存检测历史时调用）"""
+    if len(detections) == 0:
+        return NO_TARGET_TEXT
+
+    if detections.track_ids is not None:
+        text_lines = [
+            "| image_id | track_id | class_id | x_center | y_center | width | height |",
+            "|----------|----------|----------|----------|----------|-------|--------|"
+        ]
+    else:
+        text_lines = [
+            "| image_id | class_id | x_center | y_center | width | height |",
+            "|----------|----------|----------|----------|-------|--------|"
+        ]
+    for row in range(len(detections)):
+        _, _, x_center, y_center, width, height = detections.boxes[row]
+        track_cell = f" {detections.track_ids[row]} |" if detections.track_ids is not None else ""
+        text_lines.append(
+            f"| {detections.image_id} |{track_cell} {detections.label(row)} | {x_center:.4f} | {y_center:.4f} | {width:.4f} | {height:.4f} |"
+        )
+    return "\n".join(text_lines)
+
+
+class TrackCounter:
+    """按跟踪 ID 汇总视频中出现过的目标：同一目标跨多帧只计一次"""
+
+    def __init__(self):
+        # 跟踪 ID -> [类别显示名, 出现帧数, 首次出现帧号, 最高置信度]
+        self._tracks = {}
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def update(self, detections):
+        if detections.track_ids is None:
+            return
+        for row, track_id in enumerate(detections.track_ids):
+            conf = float(detections.boxes[row, 1])
+            entry = self._tracks.get(track_id)
+            if entry is None:
+                self._tracks[track_id] = [detections.label(row), 1, detections.frame_id, conf]
+            else:
+                entry[1] += 1
+                entry[3] = max(entry[3], conf)
+
+    def format(self):
+        """生成 markdown 汇总：每个类别的目标数量，以及每个跟踪目标的明细"""
+        if not self._tracks:
+            return "No tracked target."
+        per_class = {}
+        for label, _, _, _ in self._tracks.values():
+            per_class[label] = per_class.get(label, 0) + 1
+        text_lines = [
+            "| class_id | targets |",
+            "|----------|---------|",
+        ]
+        text_lines.extend(f"| {label} | {count} |" for label, count in sorted(per_class.items()))
+        text_lines += [
+            "",
+            "| track_id | class_id | first frame | frames | max conf |",
+            "|----------|----------|-------------|--------|----------|",
+        ]
+        for track_id, (label, frames, first_frame, conf) in sorted(self._tracks.items()):
+            text_lines.append(f"| {track_id} | {label} | {first_frame} | {frames} | {conf:.4f} |")
+        return "\n".join(text_lines)
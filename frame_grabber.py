@@ -0,0 +1,72 @@
+# frame_grabber.py
+import threading
+import time
+
+
+class LatestFrameGrabber:
+    """后台线程持续读取摄像头（或按帧率读取视频文件），只保留最新一帧（latest-frame-wins），避免推理慢于采集时画面延迟不断累积"""
+
+    def __init__(self, cap, pace_fps=None):
+        """pace_fps：读取视频文件时按该帧率实时读取（模拟直播流），摄像头为 None"""
+        self.cap = cap
+        self.pace_fps = pace_fps
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._frame = None
+        self._frame_id = 0
+        self._capture_time = 0.0
+        self._consumed_id = 0
+        # 统计计数：已采集帧数、未被推理就被新帧覆盖的帧数
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.failed = False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        start_time = time.perf_counter()
+        while self._running:
+            if self.pace_fps:
+                delay = start_time + self.captured_frames / self.pace_fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            ret, frame = self.cap.read()
+            capture_time = time.perf_counter()
+            with self._cond:
+                if not ret:
+                    self.failed = True
+                    self._cond.notify_all()
+                    break
+                # 上一帧尚未被取走就被覆盖，计为丢帧
+                if self._frame_id > self._consumed_id:
+                    self.dropped_frames += 1
+                self._frame = frame
+                self._frame_id += 1
+                self._capture_time = capture_time
+                self.captured_frames += 1
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """等待一帧比上次读取更新的画面，返回 (帧序号, 帧, 采集时刻)；帧序号从 0 开始，与视频文件的帧序号一致；
+        超时或采集失败返回 None"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._frame_id > self._consumed_id or self.failed or not self._running,
+                timeout
+            )
+            if self._frame_id <= self._consumed_id:
+                return None
+            self._consumed_id = self._frame_id
+            return self._frame_id - 1, self._frame, self._capture_time
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
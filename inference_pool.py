@@ -0,0 +1,111 @@
+# inference_pool.py
+# 多进程 CPU 推理池：把文件夹内的图片分片交给多个进程并行检测，本模块不得导入 PyQt6
+import multiprocessing
+import os
+import sys
+
+# 自动配置时每个进程使用的 PyTorch 线程数（核心较少时退化为 1）
+AUTO_THREADS_PER_WORKER = 2
+
+# 每个工作进程内的检测引擎，由 _init_worker 创建，进程存活期间只加载一次模型
+_worker_engine = None
+# 模型加载失败时的错误信息；不在初始化函数中抛出异常，否则进程池会不断重启工作进程
+_worker_error = None
+
+
+def resolve_pool_size(workers=0, threads_per_worker=0, cpu_count=None):
+    """
+    计算 (进程数, 每进程线程数)，0 表示自动。
+    两者都自动时每进程 2 个线程、进程数占满全部核心；只指定其一时另一个按核心数平分。
+    """
+    cores = cpu_count or os.cpu_count() or 1
+    if workers <= 0 and threads_per_worker <= 0:
+        threads_per_worker = AUTO_THREADS_PER_WORKER if cores >= 2 * AUTO_THREADS_PER_WORKER else 1
+    if workers <= 0:
+        workers = max(1, cores // threads_per_worker)
+    if threads_per_worker <= 0:
+        threads_per_worker = max(1, cores // workers)
+    return workers, threads_per_worker
+
+
+def _init_worker(model_path, threads_per_worker, engine_options, cache_options):
+    """工作进程初始化：固定 PyTorch 线程数并加载一次模型"""
+    global _worker_engine, _worker_error
+    # 工作进程的日志一律写到标准错误，不混入命令行写到标准输出的检测结果；
+    # spawn 方式重新导入主模块时 ultralytics 可能已绑定原标准输出，需一并转向
+    sys.stdout = sys.stderr
+    from model_backends import log_to_stderr
+    log_to_stderr()
+    import torch
+    torch.set_num_threads(threads_per_worker)
+    torch.set_num_interop_threads(1)
+
+    # 推迟导入，避免与 detection_core 循环导入
+    from detection_core import DetectionEngine
+    result_cache = None
+    if cache_options is not None:
+        from result_cache import ResultCache
+        result_cache = ResultCache(*cache_options)
+    engine = DetectionEngine(model_path, 'folder', None, result_cache=result_cache, **engine_options)
+    if engine.load_model():
+        _worker_engine = engine
+    else:
+        _worker_error = engine.error
+
+
+def _detect_chunk(task):
+    """检测一个分片，返回 (分片图片数, [FrameDetections], 标注画面或 None)"""
+    chunk, want_frame = task
+    engine = _worker_engine
+    if engine is None:
+        raise RuntimeError(_worker_error)
+    frame_ids = {path: frame_id for frame_id, path in chunk}
+    # 只绘制分片中的最后一张，命中缓存的其余图片无需解码
+    outputs = engine.infer_image_files([path for _, path in chunk],
+                                       frame_indices={len(chunk) - 1} if want_frame else set())
+    detections = []
+    for path, result in outputs:
+        engine.filter_top_k_boxes(result)
+        image_id = os.path.splitext(os.path.basename(path))[0]
+        detections.append(engine.extract_detections(result, image_id, frame_ids[path]))
+    frame = engine.ensure_frame(outputs[-1][1]).plot() if want_frame and outputs else None
+    return len(chunk), detections, frame
+
+
+class InferencePool:
+    """
+    多进程推理池。每个进程加载一次模型并使用固定的 PyTorch 线程数，避免单进程内线程池扩展性差的问题；
+    run() 以生成器形式按分片返回结果，ordered=False 时哪个分片先完成就先返回。
+    使用 spawn 方式启动进程，子进程不继承父进程中的模型、Qt 对象与数据库连接。
+    """
+
+    def __init__(self, model_path, conf_threshold, iou_threshold, top_k, imgsz=None, annotate=True,
+                 result_cache=None, workers=0, threads_per_worker=0, ordered=True, tile_options=None):
+        self.workers, self.threads_per_worker = resolve_pool_size(workers, threads_per_worker)
+        self.annotate = annotate
+        self.ordered = ordered
+        engine_options = {"conf_threshold": conf_threshold, "iou_threshold": iou_threshold,
+                          "top_k": top_k, "imgsz": imgsz, "annotate": annotate, **(tile_options or {})}
+        cache_options = (result_cache.db_file, result_cache.max_bytes) if result_cache is not None else None
+        self._pool = multiprocessing.get_context("spawn").Pool(
+            processes=self.workers, initializer=_init_worker,
+            initargs=(model_path, self.threads_per_worker, engine_options, cache_options)
+        )
+
+    def run(self, image_paths, chunk_size):
+        """分片检测 image_paths，逐个分片产出 (分片图片数, [FrameDetections], 标注画面或 None)"""
+        tasks = [
+            ([(start + offset, path) for offset, path in enumerate(image_paths[start:start + chunk_size])],
+             self.annotate)
+            for start in range(0, len(image_paths), chunk_size)
+        ]
+        imap = self._pool.imap if self.ordered else self._pool.imap_unordered
+        yield from imap(_detect_chunk, tasks)
+
+    def close(self, wait=True):
+        """wait=False 时立即终止仍在运行的进程（用于中途停止检测）"""
+        if wait:
+            self._pool.close()
+        else:
+            self._pool.terminate()
+        self._pool.join()
@@ -1,22 +1,57 @@
 # main.py
+# 冷启动：先显示登录窗口，主界面模块（PyTorch / ultralytics）在后台线程导入并预热模型；
+# 使用 --startup-report 参数运行时在主界面显示后打印启动耗时报告
 import sys
+from startup import StartupTimer, BackgroundPreloader
+startup_timer = StartupTimer()
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import Qt, QTimer
 from ui_login import LoginWindow
-from ui_main_window import MainWindow
+# 主界面显示后检查后台模型预热是否完成的间隔（毫秒）
+PRELOAD_POLL_MS = 200
 class AppController:
-    def __init__(self):
+    def __init__(self, timer, show_report=False):
         self.login_window = None
         self.main_window = None
+        self.timer = timer
+        self.show_report = show_report
+        self.preloader = BackgroundPreloader(timer)
     def show_login(self):
         self.login_window = LoginWindow(on_login_success=self.show_main_window)
         self.login_window.show()
+        self.timer.mark("login window shown")
+        # 等登录窗口完成首次绘制后再开始后台导入
+        QTimer.singleShot(0, self.preloader.start)
     def show_main_window(self):
-        self.main_window = MainWindow()
+        # 只等待后台导入完成（通常在输入账号密码期间已完成），模型加载与预热不阻塞界面
+        if not self.preloader.is_imported():
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            with self.timer.span("wait for background import"):
+                self.preloader.wait_for_import()
+            QApplication.restoreOverrideCursor()
+        from ui_main_window import MainWindow
+        with self.timer.span("create main window"):
+            self.main_window = MainWindow()
         self.main_window.show()
+        self.timer.mark("main window shown")
         if self.login_window:
             self.login_window.close()
+        if not self.preloader.is_done():
+            self.main_window.statusBar().showMessage("Loading detection model in the background...")
+            self.poll_preload()
+        elif self.show_report:
+            print(self.timer.report(), file=sys.stderr)
+    def poll_preload(self):
+        """模型预热完成后清除状态栏提示（并输出启动报告）"""
+        if not self.preloader.is_done():
+            QTimer.singleShot(PRELOAD_POLL_MS, self.poll_preload)
+            return
+        self.main_window.statusBar().clearMessage()
+        if self.show_report:
+            print(self.timer.report(), file=sys.stderr)
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    controller = AppController()
+    startup_timer.mark("QApplication created")
+    controller = AppController(startup_timer, show_report="--startup-report" in sys.argv)
     controller.show_login()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -0,0 +1,76 @@
+# model_backends.py
+# 推理后端：PyTorch 权重（.pt）与 ONNX Runtime（.onnx）统一通过 ultralytics.YOLO 加载，
+# 前处理（letterbox）与后处理（NMS、坐标还原）完全一致，输出结果格式相同；本模块不得导入 PyQt6
+import logging
+import os
+import shutil
+import sys
+
+from ultralytics import YOLO
+from ultralytics.utils import LOGGER
+
+BACKEND_TORCH = 'torch'
+BACKEND_ONNX = 'onnx'
+
+# 导出的 ONNX 模型缓存目录，文件名包含原权重的内容哈希，权重更新后会重新导出
+ONNX_CACHE_DIR = "onnx_cache"
+# 导出时的默认输入尺寸；使用动态输入，推理时仍可批量并修改 imgsz
+ONNX_EXPORT_IMGSZ = 640
+
+
+def model_backend(model_path):
+    """根据文件后缀判断推理后端"""
+    return BACKEND_ONNX if model_path.lower().endswith(".onnx") else BACKEND_TORCH
+
+
+def default_device(model_path, device=None):
+    """ONNX 模型固定在 CPU 上通过 ONNX Runtime 推理，其余情况沿用调用方指定的设备"""
+    if device is None and model_backend(model_path) == BACKEND_ONNX:
+        return 'cpu'
+    return device
+
+
+def log_to_stderr():
+    """
+    把 ultralytics 日志从标准输出转到标准错误（命令行工具的标准输出只保留结果数据）。
+    ultralytics 导入时已把 sys.stdout 绑定到日志处理器上，contextlib.redirect_stdout 对其无效，需直接替换处理器的输出流
+    """
+    for handler in LOGGER.handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream in (sys.stdout, sys.__stdout__):
+            handler.setStream(sys.stderr)
+
+
+def load_model(model_path):
+    """加载检测模型；ONNX 文件不含任务信息，需显式指定为检测任务"""
+    if model_backend(model_path) == BACKEND_ONNX:
+        return YOLO(model_path, task='detect')
+    return YOLO(model_path)
+
+
+def cached_onnx_path(model_path, cache_dir=ONNX_CACHE_DIR):
+    """返回 .pt 权重对应的 ONNX 缓存文件路径（不保证已存在）"""
+    # 推迟导入，避免加载本模块时就引入结果缓存的依赖
+    from result_cache import weights_hash
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{stem}-{weights_hash(model_path)[:12]}.onnx")
+
+
+def export_onnx(model_path, imgsz=ONNX_EXPORT_IMGSZ, cache_dir=ONNX_CACHE_DIR):
+    """
+    把 .pt 权重导出为 ONNX 并缓存，返回 ONNX 文件路径；同一权重已导出过时直接返回缓存文件。
+    需要安装 onnx（导出）与 onnxruntime（推理）。
+    """
+    if model_backend(model_path) == BACKEND_ONNX:
+        return model_path
+    target = cached_onnx_path(model_path, cache_dir)
+    if os.path.exists(target):
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+    # 动态输入尺寸：文件夹批量推理需要 batch > 1，自适应分辨率需要修改 imgsz
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=False)
+    # ultralytics 把 ONNX 文件导出到权重旁边；移动到缓存目录，不在用户的权重目录中留下副本。
+    # 先移动为临时文件再改名（可能跨磁盘），避免中途失败留下不完整的缓存
+    temp_path = target + ".tmp"
+    shutil.move(exported, temp_path)
+    os.replace(temp_path, target)
+    return target
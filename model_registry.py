@@ -0,0 +1,143 @@
+# model_registry.py
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from model_backends import load_model, default_device
+
+# 缓存模型的总内存预算（MB），超出后按最近最少使用（LRU）顺序淘汰
+DEFAULT_MEMORY_BUDGET_MB = 1024
+# 预热推理使用的输入尺寸
+WARMUP_IMGSZ = 640
+
+
+class _CachedModel:
+    """注册表中的一条缓存记录"""
+
+    def __init__(self, model, size_bytes, load_time):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.load_time = load_time
+
+
+def weights_identity(model_path):
+    """权重文件的标识：(绝对路径, 修改时间, 文件大小)，重新训练覆盖同一路径后标识随之变化；文件不存在时抛出 OSError"""
+    path = os.path.abspath(model_path)
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def _model_key(model_path, device):
+    """生成缓存键：(绝对路径, 修改时间, 文件大小, 设备)，权重文件变化后键随之变化"""
+    return weights_identity(model_path) + (device or "auto",)
+
+
+def _estimate_model_bytes(model, model_path):
+    """估算模型常驻内存（参数与 buffer 字节数），无法统计时退化为权重文件大小"""
+    try:
+        torch_model = model.model
+        total = sum(p.numel() * p.element_size() for p in torch_model.parameters())
+        total += sum(b.numel() * b.element_size() for b in torch_model.buffers())
+        if total > 0:
+            return total
+    except (AttributeError, TypeError):
+        pass
+    return os.path.getsize(model_path)
+
+
+class ModelRegistry:
+    """进程级模型注册表：在多个 YoloDetector 实例之间复用已加载并预热的模型"""
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # 每个模型实例一把推理锁：共享同一模型的线程需串行调用预测器；
+        # 以模型实例的弱引用为键，模型被淘汰且不再使用后锁随之释放，新模型不会继承旧模型的锁
+        self._model_locks = weakref.WeakKeyDictionary()
+
+    def get(self, model_path, device=None):
+        """返回已加载的模型（.pt 或 .onnx）；首次使用或权重文件变化时才重新加载"""
+        device = default_device(model_path, device)
+        key = _model_key(model_path, device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry.model
+
+            # 同一路径的旧版本权重已失效，直接丢弃
+            for stale_key in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[stale_key]
+
+            start = time.perf_counter()
+            model = load_model(model_path)
+            self._warmup(model, device)
+            load_time = time.perf_counter() - start
+            print(f"YOLO model loaded and warmed up in {load_time:.2f}s: {model_path}")
+
+            self._entries[key] = _CachedModel(model, _estimate_model_bytes(model, model_path), load_time)
+            self._evict_over_budget()
+            return model
+
+    def _warmup(self, model, device):
+        """用空白图像跑一次推理，提前完成预测器初始化与首帧开销"""
+        dummy = np.zeros((WARMUP_IMGSZ, WARMUP_IMGSZ, 3), dtype=np.uint8)
+        kwargs = {"verbose": False}
+        if device:
+            kwargs["device"] = device
+        model(dummy, **kwargs)
+
+    def _evict_over_budget(self):
+        """超出内存预算时按 LRU 顺序淘汰，始终保留最近使用的模型"""
+        total = sum(entry.size_bytes for entry in self._entries.values())
+        while total > self.memory_budget_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            total -= entry.size_bytes
+            print(f"Evicted cached model: {key[0]}")
+
+    def model_lock(self, model):
+        """返回模型实例对应的推理锁，首次调用时创建"""
+        with self._lock:
+            return self._model_locks.setdefault(model, threading.Lock())
+
+    def evict(self, model_path):
+        """手动移除某个权重文件对应的所有缓存模型"""
+        path = os.path.abspath(model_path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def load_time(self, model_path, device=None):
+        """返回缓存模型的加载+预热耗时（秒），未缓存时返回 None"""
+        try:
+            key = _model_key(model_path, default_device(model_path, device))
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.load_time if entry else None
+
+
+_registry = ModelRegistry()
+
+
+def get_model(model_path, device=None):
+    """从进程级注册表获取模型"""
+    return _registry.get(model_path, device)
+
+
+def get_model_lock(model):
+    """返回某个模型实例的推理锁"""
+    return _registry.model_lock(model)
+
+
+def get_registry():
+    return _registry
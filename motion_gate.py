@@ -0,0 +1,63 @@
+# motion_gate.py
+# 运动门控：在模型推理之前用缩小后的灰度帧差判断画面是否变化，画面静止时跳过推理、复用上一次的检测结果；
+# 本模块不导入 PyQt6
+import cv2
+import numpy as np
+
+# 帧差计算前把画面缩小到该宽度，计算量与原始分辨率无关
+GATE_WIDTH = 160
+# 单个像素灰度差超过该值才计为变化（过滤传感器噪声与压缩噪点）
+PIXEL_DIFF_THRESHOLD = 25
+# 默认变化阈值：变化像素占比（0~1）低于该值的帧跳过推理
+DEFAULT_CHANGE_THRESHOLD = 0.005
+# 默认最多连续跳过的帧数，超过后强制推理一次，限制结果的陈旧程度
+DEFAULT_MAX_SKIP = 30
+
+
+class MotionGate:
+    """
+    每帧推理前调用 check()：与上一次推理时的画面比较，变化像素占比达到阈值或已连续跳过 max_skip 帧时返回 True（需要推理），
+    否则返回 False（复用上一次结果）。只在推理时更新参考画面，缓慢的累积变化最终也会触发推理。
+    """
+
+    def __init__(self, change_threshold=DEFAULT_CHANGE_THRESHOLD, max_skip=DEFAULT_MAX_SKIP):
+        self.change_threshold = change_threshold
+        self.max_skip = max(0, int(max_skip))
+        self._reference = None
+        self._skipped_in_row = 0
+        # 统计：经过门控的帧数、跳过推理的帧数、最近一帧的变化像素占比
+        self.total_frames = 0
+        self.skipped_frames = 0
+        self.change = None
+
+    @staticmethod
+    def _prepare(frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (GATE_WIDTH, max(1, h * GATE_WIDTH // w)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, frame):
+        """返回该帧是否需要推理"""
+        self.total_frames += 1
+        small = self._prepare(frame)
+        if self._reference is None or self._reference.shape != small.shape or self._skipped_in_row >= self.max_skip:
+            changed = True
+        else:
+            diff = cv2.absdiff(small, self._reference)
+            self.change = np.count_nonzero(diff > PIXEL_DIFF_THRESHOLD) / diff.size
+            changed = self.change >= self.change_threshold
+        if changed:
+            self._reference = small
+            self._skipped_in_row = 0
+        else:
+            self.skipped_frames += 1
+            self._skipped_in_row += 1
+        return changed
+
+    def skip_ratio(self):
+        return self.skipped_frames / self.total_frames if self.total_frames else 0.0
+
+    def summary(self):
+        return (f"Motion gating skipped {self.skipped_frames} of {self.total_frames} frames "
+                f"({self.skip_ratio():.0%}).")
@@ -0,0 +1,139 @@
+# prefetch.py
+# 文件夹浏览时的预取：在后台线程提前解码并推理相邻图片，本模块不导入 PyQt6
+import queue
+import threading
+from collections import OrderedDict
+
+from detection_core import DetectionEngine
+
+# 内存中最多保留的预取结果数量（标注画面已缩放到显示尺寸）
+DEFAULT_MAX_ENTRIES = 8
+# 预取参数中决定检测引擎的部分；其余参数（显示尺寸、缩放模式）只影响标注画面的后处理
+ENGINE_SETTINGS = ("model_path", "weights", "conf", "iou", "top_k", "tile_options")
+_STOP = object()
+
+
+class ImagePrefetcher:
+    """
+    相邻图片预取器：单个后台线程按顺序检测 schedule() 给出的图片，结果保存在有界 LRU 缓存中。
+    每次 schedule() 都会作废尚未开始的旧任务（用户跳到别处时不再为旧位置做无用功）；
+    预取参数（模型及其权重文件标识、conf、iou、Top-K、切片推理参数、显示尺寸与缩放模式）变化后已缓存的结果全部失效。
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._generation = 0
+        self._settings = None
+        self._result_cache = None
+        self._postprocess = None
+        self._engine = None
+        self._engine_settings = None
+        self._thread = None
+
+    def schedule(self, paths, settings, result_cache=None, postprocess=None):
+        """
+        提交预取任务，按给定顺序执行。
+        settings 为预取参数字典：ENGINE_SETTINGS 中的检测参数（weights 为权重文件标识，tile_options 为切片推理参数字典），
+        以及 postprocess 所依赖的显示参数；postprocess 在后台线程内处理标注画面（如缩放到显示尺寸）。
+        """
+        with self._lock:
+            if settings != self._settings:
+                self._cache.clear()
+                self._settings = settings
+            self._result_cache = result_cache
+            self._postprocess = postprocess
+            self._generation += 1
+            generation = self._generation
+            pending = [path for path in paths if path not in self._cache]
+        # 清空队列中旧一代尚未开始的任务
+        while True:
+            try:
+                self._jobs.get_nowait()
+            except queue.Empty:
+                break
+        for path in pending:
+            self._jobs.put((generation, path))
+        if pending and self._thread is None:
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+
+    def get(self, path, settings):
+        """返回 (标注画面, 检测结果)；未预取完成或参数已变化时返回 None"""
+        with self._lock:
+            if settings != self._settings:
+                return None
+            entry = self._cache.get(path)
+            if entry is not None:
+                self._cache.move_to_end(path)
+            return entry
+
+    def cancel(self):
+        """作废所有尚未完成的预取任务"""
+        with self._lock:
+            self._generation += 1
+
+    def clear(self):
+        """丢弃全部预取结果与未完成任务（包括正在执行的那一张）"""
+        with self._lock:
+            self._generation += 1
+            self._settings = None
+            self._cache.clear()
+
+    def close(self):
+        self.clear()
+        if self._thread is not None:
+            self._jobs.put(_STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _get_engine(self, settings, result_cache):
+        """按当前参数复用或创建检测引擎；模型本身由进程级注册表共享"""
+        engine = self._engine
+        engine_settings = {key: settings[key] for key in ENGINE_SETTINGS}
+        if engine is None or self._engine_settings != engine_settings:
+            engine = DetectionEngine(settings["model_path"], 'image', None, settings["conf"], settings["iou"],
+                                     top_k=settings["top_k"], **settings["tile_options"])
+            if not engine.load_model():
+                print(f"Prefetch skipped: {engine.error}")
+                return None
+            self._engine = engine
+            self._engine_settings = engine_settings
+        engine.result_cache = result_cache
+        return engine
+
+    def _worker(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            generation, path = job
+            with self._lock:
+                if generation != self._generation or path in self._cache:
+                    continue
+                settings = self._settings
+                result_cache = self._result_cache
+                postprocess = self._postprocess
+            engine = self._get_engine(settings, result_cache)
+            if engine is None:
+                continue
+            try:
+                output = engine.detect_image_file(path)
+            except Exception as e:
+                print(f"Prefetch failed for {path}: {e}")
+                continue
+            if output is None:
+                continue
+            annotated_frame, detections = output
+            if postprocess is not None:
+                annotated_frame = postprocess(annotated_frame)
+            # 已完成的结果只要参数未变就仍然有效，即使任务所属的一代已被作废
+            with self._lock:
+                if settings != self._settings:
+                    continue
+                self._cache[path] = (annotated_frame, detections)
+                self._cache.move_to_end(path)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
@@ -0,0 +1,267 @@
+# quantize_model.py
+# INT8 训练后量化工具：用指定图片文件夹校准，生成 ONNX INT8 模型并与 FP32 模型对比速度和逐类别一致性；
+# 可在系统设置页调用，也可在命令行运行，本模块不导入 PyQt6
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from detection_core import CLASS_ID_MAP, build_class_labels, list_image_files
+from detection_results import iou_matrix
+from model_backends import BACKEND_ONNX, ONNX_CACHE_DIR, ONNX_EXPORT_IMGSZ, export_onnx, log_to_stderr, model_backend
+from model_registry import get_model, get_model_lock
+
+# 最多使用多少张图片做校准（从文件夹中均匀抽取）
+MAX_CALIBRATION_IMAGES = 100
+# 最多使用多少张图片对比 FP32 / INT8（优先取校准之外的图片）
+MAX_COMPARISON_IMAGES = 100
+# 对比时判定两个检测框为同一目标的 IoU 阈值
+MATCH_IOU = 0.5
+
+
+def quantized_model_path(model_path, cache_dir=ONNX_CACHE_DIR):
+    """返回某个权重对应的 INT8 模型路径（不保证已存在）"""
+    if model_path.lower().endswith(".onnx"):
+        base = os.path.splitext(os.path.basename(model_path))[0]
+    else:
+        from result_cache import weights_hash
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        base = f"{stem}-{weights_hash(model_path)[:12]}"
+    if base.endswith("-int8"):
+        base = base[:-len("-int8")]
+    return os.path.join(cache_dir, f"{base}-int8.onnx")
+
+
+def _evenly(paths, limit):
+    if len(paths) <= limit:
+        return list(paths)
+    step = len(paths) / limit
+    return [paths[int(i * step)] for i in range(limit)]
+
+
+def sample_images(folder_path, limit=MAX_CALIBRATION_IMAGES):
+    return _evenly(list_image_files(folder_path), limit)
+
+
+def split_images(folder_path, calibration_limit=MAX_CALIBRATION_IMAGES, comparison_limit=MAX_COMPARISON_IMAGES):
+    """
+    从文件夹中均匀抽取校准图片与对比图片，返回 (校准图片, 对比图片, 对比图片是否与校准图片互不重叠)。
+    文件夹中没有校准之外的图片时，只能在校准图片上对比。
+    """
+    paths = list_image_files(folder_path)
+    calibration = _evenly(paths, calibration_limit)
+    chosen = set(calibration)
+    held_out = [path for path in paths if path not in chosen]
+    if not held_out:
+        return calibration, _evenly(calibration, comparison_limit), False
+    return calibration, _evenly(held_out, comparison_limit), True
+
+
+def _make_calibration_reader(image_paths, input_name, imgsz):
+    """构造 ONNX Runtime 校准数据读取器，前处理与 ultralytics 推理时一致（letterbox、RGB、归一化）"""
+    from onnxruntime.quantization import CalibrationDataReader
+    from ultralytics.data.augment import LetterBox
+
+    class _FolderReader(CalibrationDataReader):
+        def __init__(self):
+            self._letterbox = LetterBox((imgsz, imgsz), auto=False)
+            self._paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self._paths:
+                frame = cv2.imread(path)
+                if frame is None:
+                    continue
+                image = self._letterbox(image=frame)[..., ::-1].transpose(2, 0, 1)
+                tensor = np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+                return {input_name: tensor}
+            return None
+
+    return _FolderReader()
+
+
+def quantize_to_int8(model_path, calibration_folder, imgsz=ONNX_EXPORT_IMGSZ, output_path=None, image_paths=None):
+    """
+    生成 INT8 静态量化模型并返回其路径。
+    .pt 权重先导出为 FP32 ONNX（复用导出缓存），再用校准图片（默认从文件夹均匀抽取）统计激活范围；
+    只量化卷积层，检测头中的解码与拼接保持 FP32，精度损失更小。
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    if image_paths is None:
+        image_paths = sample_images(calibration_folder)
+    if not image_paths:
+        raise ValueError(f"No valid image files found in {calibration_folder}")
+    fp32_path = export_onnx(model_path, imgsz=imgsz)
+    output_path = output_path or quantized_model_path(model_path)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    fp32_model = onnx.load(fp32_path)
+    input_name = fp32_model.graph.input[0].name
+    temp_path = output_path + ".tmp"
+    quantize_static(
+        fp32_path, temp_path,
+        _make_calibration_reader(image_paths, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        op_types_to_quantize=["Conv"],
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    # 保留 ultralytics 写入的元数据（类别名、输入尺寸等），否则加载后类别名丢失
+    int8_model = onnx.load(temp_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, temp_path)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def _match_count(ref_boxes, test_boxes):
+    """按置信度从高到低贪心匹配同类别、IoU 达标的检测框，返回匹配数量"""
+    if len(ref_boxes) == 0 or len(test_boxes) == 0:
+        return 0
+    ious = iou_matrix(ref_boxes, test_boxes)
+    used = set()
+    matched = 0
+    for i in range(len(ref_boxes)):
+        for j in np.argsort(-ious[i]):
+            if ious[i, j] < MATCH_IOU:
+                break
+            if j not in used:
+                used.add(j)
+                matched += 1
+                break
+    return matched
+
+
+def _run_model(model_path, image_paths, conf, iou, imgsz):
+    """逐张推理，返回 (每张耗时毫秒列表, 每张 {类别: 按置信度降序的 xyxy 框}, 类别名)"""
+    model = get_model(model_path)
+    model_lock = get_model_lock(model)
+    latencies, per_image = [], []
+    for path in image_paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        with model_lock:
+            start = time.perf_counter()
+            result = model(frame, conf=conf, iou=iou, imgsz=imgsz, verbose=False)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+        data = result.boxes.data.cpu().numpy()
+        data = data[np.argsort(-data[:, -2])]
+        classes = {}
+        for cls in np.unique(data[:, -1]).astype(int):
+            classes[cls] = data[data[:, -1] == cls, :4]
+        per_image.append(classes)
+    return latencies, per_image, model.names
+
+
+def compare_models(fp32_path, int8_path, image_paths, conf=0.25, iou=0.45, imgsz=ONNX_EXPORT_IMGSZ,
+                   source=None, held_out=True):
+    """
+    在同一组图片上对比 FP32 与 INT8 模型，返回 markdown 报告；source 为报告中显示的图片来源，
+    held_out 表示这些图片未参与校准。两个模型都是 ONNX 时只比较量化本身的影响，否则报告中注明后端不同。
+    一致率 = 2 × 匹配数 / (FP32 框数 + INT8 框数)，两个模型输出完全相同时为 100%。
+    """
+    folder_path = source or (os.path.dirname(image_paths[0]) if image_paths else "")
+    fp32_latency, fp32_boxes, names = _run_model(fp32_path, image_paths, conf, iou, imgsz)
+    int8_latency, int8_boxes, _ = _run_model(int8_path, image_paths, conf, iou, imgsz)
+    if not fp32_latency:
+        raise ValueError(f"No readable images in {folder_path}")
+
+    labels = build_class_labels(names)
+    counts = {cls: [0, 0, 0] for cls in names}
+    for ref, test in zip(fp32_boxes, int8_boxes):
+        for cls in set(ref) | set(test):
+            ref_cls = ref.get(cls, np.zeros((0, 4)))
+            test_cls = test.get(cls, np.zeros((0, 4)))
+            counts[cls][0] += len(ref_cls)
+            counts[cls][1] += len(test_cls)
+            counts[cls][2] += _match_count(ref_cls, test_cls)
+
+    fp32_mean, int8_mean = np.mean(fp32_latency), np.mean(int8_latency)
+    lines = [
+        "# INT8 quantization report",
+        "",
+        f"* FP32 model: `{fp32_path}`",
+        f"* INT8 model: `{int8_path}`",
+        ("* Backend: ONNX Runtime for both models, so differences come from quantization alone"
+         if model_backend(fp32_path) == BACKEND_ONNX
+         else "* Backend: PyTorch FP32 vs ONNX Runtime INT8, so differences include the backend switch"),
+        f"* Images: {len(fp32_latency)} from `{folder_path}` (conf={conf}, iou={iou}, imgsz={imgsz}), "
+        + ("held out from calibration" if held_out
+           else "same images as calibration (the folder has no other images)"),
+        "",
+        "| model | mean latency (ms) | median latency (ms) |",
+        "|-------|-------------------|---------------------|",
+        f"| FP32 | {fp32_mean:.1f} | {np.median(fp32_latency):.1f} |",
+        f"| INT8 | {int8_mean:.1f} | {np.median(int8_latency):.1f} |",
+        "",
+        f"Speed-up: {fp32_mean / int8_mean:.2f}x",
+        "",
+        "| class | FP32 boxes | INT8 boxes | matched | agreement |",
+        "|-------|------------|------------|---------|-----------|",
+    ]
+    # 先列出映射表中的损伤类别，再列出其余类别
+    order = sorted(counts, key=lambda cls: (names[cls] not in CLASS_ID_MAP, cls))
+    total = [0, 0, 0]
+    for cls in order:
+        fp32_count, int8_count, matched = counts[cls]
+        if fp32_count == 0 and int8_count == 0 and names[cls] not in CLASS_ID_MAP:
+            continue
+        total = [t + c for t, c in zip(total, counts[cls])]
+        lines.append(f"| {labels[cls]} | {fp32_count} | {int8_count} | {matched} | "
+                     f"{_agreement(fp32_count, int8_count, matched)} |")
+    lines.append(f"| **all** | {total[0]} | {total[1]} | {total[2]} | {_agreement(*total)} |")
+    return "\n".join(lines)
+
+
+def _agreement(fp32_count, int8_count, matched):
+    if fp32_count + int8_count == 0:
+        return "n/a"
+    return f"{200.0 * matched / (fp32_count + int8_count):.1f}%"
+
+
+def quantize_with_report(model_path, calibration_folder, conf=0.25, iou=0.45, imgsz=ONNX_EXPORT_IMGSZ):
+    """量化并生成对比报告，报告同时保存为 INT8 模型旁的 .md 文件；返回 (INT8 模型路径, 报告文本)"""
+    calibration, comparison, held_out = split_images(calibration_folder)
+    if not calibration:
+        raise ValueError(f"No valid image files found in {calibration_folder}")
+    # 与量化输入的 FP32 ONNX（导出缓存）对比，而不是 .pt 权重，避免把 PyTorch 与 ONNX Runtime 的差异算进量化误差
+    fp32_path = export_onnx(model_path, imgsz=imgsz)
+    int8_path = quantize_to_int8(model_path, calibration_folder, imgsz=imgsz, image_paths=calibration)
+    report = compare_models(fp32_path, int8_path, comparison, conf=conf, iou=iou, imgsz=imgsz,
+                            source=calibration_folder, held_out=held_out)
+    with open(os.path.splitext(int8_path)[0] + ".report.md", "w", encoding="utf-8") as f:
+        f.write(report + "\n")
+    return int8_path, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create an INT8 quantized ONNX model and compare it with FP32")
+    parser.add_argument("--model", required=True, help="Path to the FP32 model (.pt or .onnx)")
+    parser.add_argument("--calib", required=True,
+                        help="Image folder used for calibration and comparison (comparison uses held-out images)")
+    parser.add_argument("--conf", type=float, default=0.25, help="Confidence threshold for the comparison")
+    parser.add_argument("--iou", type=float, default=0.45, help="IoU threshold for NMS")
+    parser.add_argument("--imgsz", type=int, default=ONNX_EXPORT_IMGSZ, help="Calibration input size")
+    args = parser.parse_args(argv)
+    # 导出、量化与模型加载的日志打印到标准错误，标准输出只包含报告（ultralytics 日志需单独转向）
+    log_to_stderr()
+    with contextlib.redirect_stdout(sys.stderr):
+        int8_path, report = quantize_with_report(args.model, args.calib, conf=args.conf, iou=args.iou,
+                                                 imgsz=args.imgsz)
+    print(report)
+    print(f"INT8 model saved to {int8_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# result_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# 推理结果缓存使用独立的 SQLite 文件，与业务数据库分开
+CACHE_DB_FILE = "inference_cache.db"
+# 缓存总大小上限（字节），超出后按最近访问时间淘汰
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 每写入多少条检查一次是否超出大小上限
+EVICT_CHECK_INTERVAL = 100
+
+# 权重文件哈希的进程内缓存：(路径, 修改时间, 大小) -> 哈希值
+_weights_hashes = {}
+_weights_lock = threading.Lock()
+
+
+def hash_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def weights_hash(model_path):
+    """计算权重文件内容哈希；同一文件未变化时只计算一次"""
+    path = os.path.abspath(model_path)
+    stat = os.stat(path)
+    memo_key = (path, stat.st_mtime_ns, stat.st_size)
+    with _weights_lock:
+        cached = _weights_hashes.get(memo_key)
+    if cached is not None:
+        return cached
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _weights_lock:
+        _weights_hashes[memo_key] = value
+    return value
+
+
+class ResultCache:
+    """
+    按内容寻址的图片推理结果缓存。
+    键由 图片内容哈希、权重哈希、conf、iou、imgsz 组成；值为 Top-K 筛选前的全部检测框
+    （x1, y1, x2, y2, conf, cls）及原图尺寸，命中时无需经过模型即可重建结果并重新绘制。
+    """
+
+    def __init__(self, db_file=CACHE_DB_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._put_count = 0
+        self._count_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    boxes BLOB NOT NULL,
+                    orig_height INTEGER NOT NULL,
+                    orig_width INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access);")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def make_key(self, image_bytes, model_path, conf, iou, imgsz, variant=None):
+        """variant 描述其他影响结果的推理方式（如切片推理参数），None 表示整图推理"""
+        parts = [hash_bytes(image_bytes), weights_hash(model_path), f"{conf:.4f}", f"{iou:.4f}", str(imgsz or "default")]
+        if variant:
+            parts.append(variant)
+        return hash_bytes("|".join(parts).encode())
+
+    def get(self, key):
+        """返回 (boxes, (原图高, 原图宽))，未命中返回 None"""
+        conn = self._connection()
+        try:
+            row = conn.execute(
+                "SELECT boxes, orig_height, orig_width FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"读取推理结果缓存失败: {e}")
+            return None
+        self.hits += 1
+        boxes = np.frombuffer(row[0], dtype=np.float32).reshape(-1, 6).copy()
+        return boxes, (row[1], row[2])
+
+    def put(self, key, boxes, orig_shape):
+        """保存一张图片的全部检测框（N, 6）"""
+        blob = np.ascontiguousarray(boxes, dtype=np.float32).tobytes()
+        conn = self._connection()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, boxes, orig_height, orig_width, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, int(orig_shape[0]), int(orig_shape[1]), len(blob) + len(key), time.time())
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"写入推理结果缓存失败: {e}")
+            return
+        with self._count_lock:
+            self._put_count += 1
+            check = self._put_count % EVICT_CHECK_INTERVAL == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """超出大小上限时，按最近访问时间从旧到新删除，直到回落到上限的 90%"""
+        conn = self._connection()
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            target = self.max_bytes * 0.9
+            removed = []
+            for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access"):
+                if total <= target:
+                    break
+                removed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM results WHERE key = ?", removed)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"清理推理结果缓存失败: {e}")
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM results")
+        conn.commit()
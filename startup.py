@@ -0,0 +1,100 @@
+# startup.py
+# 冷启动优化：登录窗口显示后，在后台线程导入主界面模块（连带 PyTorch / ultralytics），并预先加载、预热配置的模型，
+# 用户输入账号密码的同时完成这些耗时操作；可选输出启动耗时报告。本模块只依赖标准库
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """记录启动过程中的时间点与各阶段耗时（线程安全），用于生成启动耗时报告"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+        # (名称, 相对启动的结束时刻秒数, 阶段耗时秒数或 None, 所在线程名)
+        self._entries = []
+
+    def mark(self, name):
+        """记录一个时间点"""
+        self._add(name, None)
+
+    @contextmanager
+    def span(self, name):
+        """记录一个阶段的耗时"""
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - begin)
+
+    def _add(self, name, duration):
+        with self._lock:
+            self._entries.append((name, time.perf_counter() - self.start, duration,
+                                  threading.current_thread().name))
+
+    def report(self):
+        """按时间顺序列出各时间点 / 阶段，时间单位为毫秒"""
+        with self._lock:
+            entries = sorted(self._entries, key=lambda entry: entry[1])
+        lines = ["Startup timing (ms since main.py started):"]
+        for name, at, duration, thread_name in entries:
+            line = f"  {at * 1000:8.0f}  {name}"
+            if duration is not None:
+                line += f" ({duration * 1000:.0f} ms)"
+            if thread_name != "MainThread":
+                line += f" [{thread_name}]"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+class BackgroundPreloader:
+    """
+    后台导入重型模块并预热模型。主界面创建前调用 wait_for_import()，只等待模块导入完成；
+    模型加载与预热继续在后台进行，主界面开始检测时通过模型注册表取得（仍在加载时会等待其完成，不会重复加载）。
+    """
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.error = None
+        self._imported = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="preload", daemon=True)
+
+    def start(self):
+        if self._thread.ident is None:
+            self._thread.start()
+        return self
+
+    def wait_for_import(self, timeout=None):
+        # 尚未启动（如登录窗口还没来得及绘制就完成了登录）时立即启动
+        self.start()
+        self._imported.wait(timeout)
+
+    def is_imported(self):
+        return self._imported.is_set()
+
+    def is_done(self):
+        return self._thread.ident is not None and not self._thread.is_alive()
+
+    def _run(self):
+        try:
+            try:
+                with self.timer.span("import main window (PyTorch, ultralytics)"):
+                    import ui_main_window
+            finally:
+                # 导入失败时同样放行，由主线程的正常导入给出错误
+                self._imported.set()
+            model_path = ui_main_window.DEFAULT_MODEL_PATH
+            if not os.path.isfile(model_path):
+                self.timer.mark(f"model preload skipped: {model_path} not found")
+                return
+            # 模型进入进程级注册表，主界面开始检测时直接复用（注册表加载时已完成预热推理）
+            from model_registry import get_model
+            with self.timer.span("load and warm up the configured model"):
+                get_model(model_path)
+        except Exception as e:
+            # 预加载失败不影响启动，主界面创建或开始检测时会再次尝试并给出错误提示
+            self.error = e
+            print(f"Background preload failed: {e}", file=sys.stderr)
@@ -0,0 +1,227 @@
+# table_models.py
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+
+from database import get_history_page
+from detection_results import NO_TARGET_TEXT
+
+
+class DetectionTableModel(QAbstractTableModel):
+    """检测结果表格模型：直接读取结构化结果数组，逐帧原地更新，无需重建表格项"""
+
+    HEADERS = ["image_id", "class_id", "x_center", "y_center", "width", "height"]
+    # 在"提示信息模式"（单行提示文本）与"检测结果模式"之间切换时发出，供视图调整单元格合并
+    message_mode_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._detections = None
+        self._row_count = 0
+        self._message = None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 1 if self._message is not None else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        row, col = index.row(), index.column()
+        if self._message is not None:
+            return self._message if col == 0 else None
+        if col == 0:
+            return self._detections.image_id
+        if col == 1:
+            return self._detections.label(row)
+        return f"{self._detections.boxes[row, col]:.4f}"
+
+    def set_message(self, message):
+        """切换为单行提示信息（如"正在检测"、错误信息）"""
+        self.beginResetModel()
+        self._message = message
+        self._detections = None
+        self._row_count = 0
+        self.endResetModel()
+        self.message_mode_changed.emit(True)
+
+    def set_detections(self, detections):
+        """用新一帧的结构化结果原地更新表格，只增删行数差异部分"""
+        if len(detections) == 0:
+            if self._message != NO_TARGET_TEXT:
+                self.set_message(NO_TARGET_TEXT)
+            return
+
+        if self._message is not None:
+            self.beginResetModel()
+            self._message = None
+            self._detections = detections
+            self._row_count = len(detections)
+            self.endResetModel()
+            self.message_mode_changed.emit(False)
+            return
+
+        old_count, new_count = self._row_count, len(detections)
+        if new_count > old_count:
+            self._detections = detections
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self._row_count = new_count
+            self.endInsertRows()
+        elif new_count < old_count:
+            # 先删除多余行再替换数据，保证删除过程中视图读取到的行都有效
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            self._row_count = new_count
+            self.endRemoveRows()
+            self._detections = detections
+        else:
+            self._detections = detections
+        self.dataChanged.emit(self.index(0, 0), self.index(new_count - 1, len(self.HEADERS) - 1))
+
+
+class MultiStreamTableModel(DetectionTableModel):
+    """多路检测结果表格：保留每一路最近一帧的结果并依次列出；各路结果到达频率很高，按固定间隔批量刷新"""
+
+    def __init__(self, parent=None, refresh_ms=200):
+        super().__init__(parent)
+        self._streams = {}
+        # 每行对应 (FrameDetections, 行号)，行号为 None 表示该路当前帧无目标
+        self._rows = []
+        self._dirty = False
+        self._timer = QTimer(self)
+        self._timer.setInterval(refresh_ms)
+        self._timer.timeout.connect(self._refresh)
+        self._timer.start()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return 1 if self._message is not None else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or self._message is not None:
+            return super().data(index, role)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        detections, row = self._rows[index.row()]
+        col = index.column()
+        if col == 0:
+            return detections.image_id
+        if row is None:
+            return NO_TARGET_TEXT if col == 1 else None
+        if col == 1:
+            return detections.label(row)
+        return f"{detections.boxes[row, col]:.4f}"
+
+    def set_message(self, message):
+        self._streams = {}
+        self._rows = []
+        self._dirty = False
+        super().set_message(message)
+
+    def set_detections(self, detections):
+        """只记录该路的最新结果，由定时器统一刷新表格"""
+        self._streams[detections.image_id] = detections
+        self._dirty = True
+
+    def _refresh(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        was_message = self._message is not None
+        self.beginResetModel()
+        self._message = None
+        self._rows = []
+        for detections in self._streams.values():
+            if len(detections) == 0:
+                self._rows.append((detections, None))
+            else:
+                self._rows.extend((detections, row) for row in range(len(detections)))
+        self.endResetModel()
+        if was_message:
+            self.message_mode_changed.emit(False)
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """历史记录表格模型：滚动到底部时才按页读取（键集分页），打开页面的耗时与记录总数无关"""
+
+    HEADERS = ["ID", "Detection Type", "Source File/Camera", "Detection Time", "Result Summary"]
+    COLUMNS = ["id", "detection_type", "source_path", "detection_time", "result_summary"]
+
+    def __init__(self, page_size=200, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self._rows = []
+        self._exhausted = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            # 摘要只读取了开头部分，提示可双击查看完整内容
+            if self.COLUMNS[index.column()] == "result_summary" and self.is_truncated(index.row()):
+                return "Double-click to view the full summary."
+            return None
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = row[self.COLUMNS[index.column()]]
+        return "" if value is None else str(value)
+
+    def is_truncated(self, row):
+        record = self._rows[row]
+        return (record["summary_length"] or 0) > len(record["result_summary"] or "")
+
+    def record_id(self, row):
+        return self._rows[row]["id"]
+
+    def refresh(self):
+        """清空已加载的数据并重新读取第一页"""
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        before = None
+        if self._rows:
+            last = self._rows[-1]
+            before = (last["detection_time"], last["id"])
+        page = get_history_page(before, self.page_size)
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
@@ -0,0 +1,140 @@
+# telemetry.py
+# 运行时性能指标：滚动窗口内的帧率、各阶段 p50/p95 耗时、队列深度、丢帧数、内存占用与模型加载耗时，
+# 可选写入按大小轮转的指标日志；本模块不导入 PyQt6
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+
+# 每个阶段保留的最近耗时样本数，以及计算帧率的时间窗口（秒）
+WINDOW_SAMPLES = 300
+FPS_WINDOW = 5.0
+# 发送指标快照的间隔（秒）
+METRICS_INTERVAL = 1.0
+# 指标日志：默认文件名、单个文件大小上限与保留的历史文件数
+METRICS_LOG_FILE = "metrics.log"
+METRICS_LOG_MAX_BYTES = 5 * 1024 * 1024
+METRICS_LOG_BACKUPS = 3
+
+_loggers = {}
+_loggers_lock = threading.Lock()
+
+
+def current_rss_mb():
+    """当前进程常驻内存（MB）；优先使用 psutil，Linux 上退化为读取 /proc，均不可用时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class MetricsCollector:
+    """线程安全的滚动指标收集器：各处理阶段调用 record()/set_gauge()，每帧输出后调用 count_frame()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._frame_times = deque()
+        self._gauges = {}
+        self._last_emit = time.perf_counter()
+
+    def record(self, stage, ms):
+        with self._lock:
+            samples = self._stages.get(stage)
+            if samples is None:
+                samples = self._stages[stage] = deque(maxlen=WINDOW_SAMPLES)
+            samples.append(ms)
+
+    def set_gauge(self, name, value):
+        """记录瞬时值（队列深度、丢帧数、模型加载耗时等）"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def count_frame(self):
+        now = time.perf_counter()
+        with self._lock:
+            self._frame_times.append(now)
+            while self._frame_times and now - self._frame_times[0] > FPS_WINDOW:
+                self._frame_times.popleft()
+
+    def due(self):
+        """距上次发送已超过间隔时返回 True，并重新计时"""
+        now = time.perf_counter()
+        with self._lock:
+            if now - self._last_emit < METRICS_INTERVAL:
+                return False
+            self._last_emit = now
+            return True
+
+    def snapshot(self):
+        """返回当前指标快照（可直接序列化为 JSON）"""
+        with self._lock:
+            frame_times = list(self._frame_times)
+            stages = {name: sorted(samples) for name, samples in self._stages.items() if samples}
+            gauges = dict(self._gauges)
+        fps = 0.0
+        if len(frame_times) >= 2 and frame_times[-1] > frame_times[0]:
+            fps = (len(frame_times) - 1) / (frame_times[-1] - frame_times[0])
+        return {
+            "time": time.time(),
+            "fps": fps,
+            "stages": {
+                name: {"p50_ms": _percentile(ordered, 0.5), "p95_ms": _percentile(ordered, 0.95)}
+                for name, ordered in stages.items()
+            },
+            "gauges": gauges,
+            "rss_mb": current_rss_mb(),
+        }
+
+
+def get_metrics_logger(path=METRICS_LOG_FILE):
+    """返回写入指定文件的指标日志记录器（按大小轮转），同一路径只创建一次"""
+    path = os.path.abspath(path)
+    with _loggers_lock:
+        logger = _loggers.get(path)
+        if logger is None:
+            logger = logging.getLogger(f"yolo_metrics.{path}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=METRICS_LOG_MAX_BYTES, backupCount=METRICS_LOG_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            _loggers[path] = logger
+        return logger
+
+
+def log_metrics(logger, source_type, snapshot):
+    """以 JSON Lines 格式写入一条指标快照"""
+    logger.info(json.dumps(dict(snapshot, source_type=source_type), ensure_ascii=False))
+
+
+def format_metrics(snapshot):
+    """生成界面显示用的多行指标文本"""
+    lines = [f"FPS: {snapshot['fps']:.1f}"]
+    for name, stats in snapshot["stages"].items():
+        lines.append(f"{name}: p50 {stats['p50_ms']:.1f} ms / p95 {stats['p95_ms']:.1f} ms")
+    gauges = snapshot["gauges"]
+    for name, value in gauges.items():
+        if name == "model_load_s":
+            lines.append(f"model load: {value:.2f} s")
+        else:
+            lines.append(f"{name.replace('_', ' ')}: {value}")
+    if snapshot["rss_mb"] is not None:
+        lines.append(f"RSS: {snapshot['rss_mb']:.0f} MB")
+    return "\n".join(lines)
@@ -0,0 +1,127 @@
+# tiled_inference.py
+# 切片（分块）推理：把高分辨率图片切成相互重叠的图块分批推理，再把各图块的检测框映射回原图并跨接缝合并（NMS 或 WBF），
+# 避免小目标（hole、scratch）在整图缩放到模型输入尺寸时消失；本模块不导入 PyQt6
+import cv2
+import numpy as np
+
+MERGE_NMS = 'nms'
+MERGE_WBF = 'wbf'
+# 默认图块边长（像素）与相邻图块的重叠比例
+DEFAULT_TILE_SIZE = 640
+DEFAULT_TILE_OVERLAP = 0.2
+# NMS 合并判定为同一目标的阈值：一般情况下（包括整图推理的框与图块的框之间）按 IoU；
+# 不同图块中伸入重叠区域的框之间按 交集 / 较小框面积（被接缝截断的框多半包含在完整框内，IoU 偏低）
+MERGE_IOU_THRESHOLD = 0.5
+MERGE_IOS_THRESHOLD = 0.5
+# WBF 聚类使用 IoU 阈值：只融合位置相近的框，避免被截断的半个框把融合结果拉偏
+WBF_IOU_THRESHOLD = 0.55
+# 缩略图灰度标准差低于该值的图块视为无内容（纯色背景、黑边、过曝区域），不送入模型
+BLANK_TILE_STD = 4.0
+BLANK_CHECK_SIZE = 64
+
+
+def tile_windows(width, height, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_TILE_OVERLAP):
+    """返回覆盖整张图片的图块窗口列表 [(x1, y1, x2, y2)]；最后一行 / 列贴齐图片边缘，图块大小保持一致"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def is_blank_tile(tile):
+    """图块内容是否近乎均匀（缩小后计算灰度标准差，开销与图块大小无关）"""
+    thumb = cv2.resize(tile, (BLANK_CHECK_SIZE, BLANK_CHECK_SIZE), interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    return float(thumb.std()) < BLANK_TILE_STD
+
+
+def seam_tiles(boxes, tile_index, windows):
+    """
+    图块 tile_index 中的框（原图坐标）是否伸入与其他图块重叠的区域：是则返回该图块序号，否则返回 -1。
+    只有这类框才可能是同一目标在相邻图块中的重复检测。
+    """
+    others = np.array([window for index, window in enumerate(windows) if index != tile_index], dtype=np.float32)
+    result = np.full(len(boxes), -1, dtype=np.int64)
+    if len(boxes) == 0 or len(others) == 0:
+        return result
+    top_left = np.maximum(boxes[:, None, :2], others[None, :, :2])
+    bottom_right = np.minimum(boxes[:, None, 2:4], others[None, :, 2:4])
+    touches = np.all(bottom_right > top_left, axis=2).any(axis=1)
+    result[touches] = tile_index
+    return result
+
+
+def _overlap(box, boxes, smaller):
+    """一个框与一组框的重叠程度：smaller 为 True 时为 交集 / 较小框面积，否则为 IoU"""
+    top_left = np.maximum(box[:2], boxes[:, :2])
+    bottom_right = np.minimum(box[2:4], boxes[:, 2:4])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=1)
+    area = np.prod(box[2:4] - box[:2])
+    areas = np.prod(boxes[:, 2:4] - boxes[:, :2], axis=1)
+    if smaller:
+        return inter / (np.minimum(area, areas) + 1e-9)
+    return inter / (area + areas - inter + 1e-9)
+
+
+def _clusters(boxes, iou_threshold, seams=None):
+    """
+    按置信度从高到低贪心聚类：每个簇以最高置信度的框为中心，吸收与其重叠达到阈值的其余框。
+    seams 为各框的接缝图块序号（见 seam_tiles，-1 表示不在接缝处），给出时不同图块的接缝框之间还按 IoS 判定。
+    返回 [(按 IoU 归入的下标（首个为中心框）, 仅按 IoS 跨接缝归入的下标)]。
+    """
+    order = np.argsort(-boxes[:, 4])
+    remaining = order
+    clusters = []
+    while len(remaining):
+        head, rest = remaining[0], remaining[1:]
+        by_iou = _overlap(boxes[head], boxes[rest], smaller=False) >= iou_threshold
+        by_seam = np.zeros(len(rest), dtype=bool)
+        if seams is not None and seams[head] >= 0 and len(rest):
+            across_seam = (seams[rest] >= 0) & (seams[rest] != seams[head])
+            by_seam = ~by_iou & across_seam & (_overlap(boxes[head], boxes[rest], smaller=True) >= MERGE_IOS_THRESHOLD)
+        clusters.append((np.concatenate([[head], rest[by_iou]]).astype(np.int64), rest[by_seam]))
+        remaining = rest[~(by_iou | by_seam)]
+    return clusters
+
+
+def merge_boxes(boxes, method=MERGE_NMS, seams=None):
+    """
+    按类别合并原图坐标下的检测框，boxes 为 (N, 6) 数组：x1, y1, x2, y2, conf, cls；seams 见 seam_tiles（可选）。
+    两种方式都按 IoU 聚类，不同图块的接缝框之间另按 交集 / 较小框面积 判定为同一目标：
+    NMS 保留每簇中置信度最高的框，WBF 把按 IoU 归入的框按置信度加权平均坐标，置信度均取簇内最大值；
+    跨接缝归入的框多为被图块边缘截断的部分，结果框取其与上述框的并集，避免输出被截断的框。
+    整图推理的框与图块的框之间只按 IoU 判定，整图中的大框不会吞掉其内部的小目标。
+    """
+    use_wbf = method == MERGE_WBF
+    threshold = WBF_IOU_THRESHOLD if use_wbf else MERGE_IOU_THRESHOLD
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    if seams is not None:
+        seams = np.asarray(seams).reshape(-1)
+    merged = []
+    for cls in np.unique(boxes[:, 5]):
+        in_class = boxes[:, 5] == cls
+        class_boxes = boxes[in_class]
+        class_seams = seams[in_class] if seams is not None else None
+        for members, seam_members in _clusters(class_boxes, threshold, class_seams):
+            group = class_boxes[members]
+            box = group[0].copy()
+            if use_wbf and len(members) > 1:
+                weights = group[:, 4:5]
+                box[:4] = (group[:, :4] * weights).sum(axis=0) / weights.sum()
+            if len(seam_members):
+                pieces = class_boxes[seam_members]
+                box[:2] = np.minimum(box[:2], pieces[:, :2].min(axis=0))
+                box[2:4] = np.maximum(box[2:4], pieces[:, 2:4].max(axis=0))
+            merged.append(box)
+    if not merged:
+        return np.zeros((0, 6), dtype=np.float32)
+    merged = np.stack(merged)
+    return merged[np.argsort(-merged[:, 4])]
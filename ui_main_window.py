@@ -1,14 +1,35 @@
-import cv2
 import sys
 import os
-from database import add_history_record, get_all_history, update_history_summary, add_feedback
+import numpy as np
+from database import (add_history_record, update_history_summary, get_history_summary, add_feedback,
+                      DetectionRecorder)
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QStackedWidget, QListWidget, QLabel, QFileDialog, QFrame,
                              QTextEdit, QLineEdit, QFormLayout, QDoubleSpinBox, QMessageBox,
-                             QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QApplication)
+                             QHeaderView, QComboBox, QApplication,
+                             QSpinBox, QProgressBar, QTableView, QCheckBox, QDialog)
 from PyQt6.QtGui import QPixmap, QImage, QIcon
 from PyQt6.QtCore import Qt
-from yolo_detector import YoloDetector
+from yolo_detector import YoloDetector, BackgroundTask, SCALE_FAST, SCALE_SMOOTH, resize_to_fit
+from detection_core import (list_image_files, parse_stream_sources, stream_names, PACING_SOURCE_FPS, PACING_FAST,
+                            DEFAULT_TOP_K)
+from table_models import DetectionTableModel, MultiStreamTableModel, HistoryTableModel
+from adaptive_resolution import format_resolution
+from motion_gate import DEFAULT_MAX_SKIP
+from video_exporter import default_export_path, EXPORT_DIR, POLICY_BLOCK, POLICY_DROP
+from tiled_inference import DEFAULT_TILE_SIZE, DEFAULT_TILE_OVERLAP, MERGE_NMS, MERGE_WBF
+from telemetry import format_metrics, METRICS_LOG_FILE
+from result_cache import ResultCache
+from model_backends import export_onnx, model_backend, BACKEND_ONNX
+from quantize_model import quantize_with_report, quantized_model_path
+from detection_results import format_results
+from prefetch import ImagePrefetcher
+from model_registry import weights_identity
+
+# ------------------------------------------需修改：修改成自己的训练模型------------------------------------------------------
+# 启动时登录窗口显示后会在后台预先加载并预热该模型
+DEFAULT_MODEL_PATH = r"D:\竞赛\2025妈妈杯-大数据挑战赛\MCB2501644\支撑材料\code\Q2\ultralytics-main\ultralytics\runs\yolo11n\weights\best.pt"
+# --------------------------------------------------------------------------------------------------------------------------
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -16,10 +37,26 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Intelligent Container Damage Detection System")
         self.setGeometry(100, 100, 1200, 800)
         self.detector_thread = None
+        # 模型导出 / 量化在后台线程中执行，同一时间只运行一个
+        self.model_tool_thread = None
+        self.active_image_label = None
         self.current_history_id = None
+        # 视频/摄像头会话的逐帧检测明细由后台线程批量写入数据库
+        self.detection_recorder = DetectionRecorder().start()
+        # 图片推理结果缓存：重复检测同一张图片时不再经过模型
+        self.result_cache = ResultCache()
+        # 文件夹浏览时在后台预取并检测相邻图片，翻页时直接显示
+        self.image_prefetcher = ImagePrefetcher()
         # 新增：批量图片检测的图片列表和当前索引
         self.image_paths = []
         self.current_image_index = -1
+        self.image_folder = None
+        # 视频 / 摄像头页面结果区显示当前输入分辨率的标签
+        self.resolution_labels = {}
+        # 各检测页面的实时性能指标标签，以及最近一次收到的指标快照
+        self.metrics_labels = {}
+        self.latest_metrics = None
+        self.detection_source_type = None
 
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -30,7 +67,7 @@ class MainWindow(QMainWindow):
         nav_widget.setFixedWidth(200)
 
         self.nav_list = QListWidget()
-        self.nav_items = ["Main Dashboard", "Image Detection", "Video Detection", "Real-time Detection", "System Settings", "History", "Help", "Feedback", "User Manual", "Exit"]
+        self.nav_items = ["Main Dashboard", "Image Detection", "Video Detection", "Real-time Detection", "Multi-Stream Detection", "System Settings", "History", "Help", "Feedback", "User Manual", "Exit"]
         self.nav_list.addItems(self.nav_items)
         nav_layout.addWidget(self.nav_list)
         
@@ -40,6 +77,7 @@ class MainWindow(QMainWindow):
         self.image_page = self.create_detection_page("image")
         self.video_page = self.create_detection_page("video")
         self.camera_page = self.create_detection_page("camera")
+        self.multi_page = self.create_detection_page("multi")
         self.history_page = self.create_history_page()
         self.help_page = self.create_help_page()
         self.feedback_page = self.create_feedback_page()
@@ -49,6 +87,7 @@ class MainWindow(QMainWindow):
         self.stacked_widget.addWidget(self.image_page)
         self.stacked_widget.addWidget(self.video_page)
         self.stacked_widget.addWidget(self.camera_page)
+        self.stacked_widget.addWidget(self.multi_page)
         self.stacked_widget.addWidget(self.settings_page)
         self.stacked_widget.addWidget(self.history_page)
         self.stacked_widget.addWidget(self.help_page)
@@ -133,7 +172,7 @@ class MainWindow(QMainWindow):
                 font-size: 14px;
             }
 
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 border: 1px solid #ddd;
                 gridline-color: #ddd;
@@ -146,15 +185,15 @@ class MainWindow(QMainWindow):
                 font-size: 13px;
                 text-align: center;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 6px;
                 font-size: 12px;
                 text-align: center;
             }
-            QTableWidget::item:alternate {
+            QTableView::item:alternate {
                 background-color: #f5f5f5;
             }
-            QTableWidget::item:hover {
+            QTableView::item:hover {
                 background-color: #fff3e6;
             }
 
@@ -188,8 +227,9 @@ class MainWindow(QMainWindow):
 
         self.nav_list.currentRowChanged.connect(self.handle_nav_selection)
         self.nav_list.setCurrentRow(0)
-        self.model_path_input.textChanged.connect(self.update_dashboard_info)
-        self.update_dashboard_info()
+        self.model_path_input.textChanged.connect(self.refresh_model_variants)
+        self.model_variant_combo.currentIndexChanged.connect(self.update_dashboard_info)
+        self.refresh_model_variants()
 
     def handle_nav_selection(self, index):
         item_text = self.nav_list.item(index).text()
@@ -200,66 +240,126 @@ class MainWindow(QMainWindow):
                 self.refresh_history_table()
             self.stacked_widget.setCurrentIndex(index)
 
-    def update_history_with_final_summary(self, final_summary):
-        if self.current_history_id is not None:
-            update_history_summary(self.current_history_id, final_summary)
-            print(f"History record ID: {self.current_history_id} has been updated with the final result.")
+    def update_history_with_final_summary(self, history_ids, final_summary, stream_summaries=None):
+        """把检测结束时的汇总写入该次检测自己的历史记录（history_ids 在启动时绑定，
+        停止后才送达的汇总也不会写进随后新开始的检测的记录）"""
+        if history_ids is None:
+            return
+        # 多路检测时每一路各有一条历史记录，各自只写入本路的汇总
+        if not isinstance(history_ids, dict):
+            history_ids = {None: history_ids}
+        for name, history_id in history_ids.items():
+            summary = final_summary
+            if name is not None:
+                summary = (stream_summaries or {}).get(name, f"{name}: No frames were processed.")
+            update_history_summary(history_id, summary)
+            print(f"History record ID: {history_id} has been updated with the final result.")
 
     def start_detection(self, source_type, source_path, image_label, results_table):
         if not source_path or source_path == "No file selected":
             QMessageBox.warning(self, "Warning", "Please select a valid source first!")
             return
         self.stop_detection()
-        model_path = self.model_path_input.text()
+        model_path = self.current_model_path()
         conf = self.conf_spinbox.value()
         iou = self.iou_spinbox.value()
-        self.detector_thread = YoloDetector(model_path, source_type, source_path, conf, iou)
-        
-        self.detector_thread.detection_finished_signal.connect(self.update_history_with_final_summary)
+        batch_size = self.batch_size_spinbox.value()
+        pacing_mode = self.pacing_combo.currentData()
+        top_k = self.top_k_spinbox.value()
+        pool_workers = self.pool_workers_spinbox.value()
+        pool_threads = self.pool_threads_spinbox.value()
+        pool_ordered = self.pool_ordered_checkbox.isChecked()
+        target_fps = self.target_fps_spinbox.value()
+        motion_threshold = self.motion_threshold_spinbox.value() / 100
+        motion_max_skip = self.motion_max_skip_spinbox.value()
+        detect_interval = self.detect_interval_spinbox.value()
+        export_path = None
+        if source_type in ('video', 'camera') and self.export_checkbox.isChecked():
+            export_path = default_export_path(source_path, self.export_dir_input.text() or EXPORT_DIR)
+        export_policy = self.export_policy_combo.currentData()
+        tile_options = self.tile_options()
+        metrics_log = METRICS_LOG_FILE if self.metrics_log_checkbox.isChecked() else None
+        scale_mode = self.scale_mode_combo.currentData()
+        result_cache = self.result_cache if self.cache_checkbox.isChecked() else None
+        self.active_image_label = image_label
+        self.detector_thread = YoloDetector(model_path, source_type, source_path, conf, iou,
+                                            display_size=(image_label.width(), image_label.height()),
+                                            scale_mode=scale_mode, batch_size=batch_size,
+                                            pacing_mode=pacing_mode, top_k=top_k, result_cache=result_cache,
+                                            pool_workers=pool_workers, pool_threads=pool_threads,
+                                            pool_ordered=pool_ordered, target_fps=target_fps,
+                                            metrics_log=metrics_log, motion_threshold=motion_threshold,
+                                            motion_max_skip=motion_max_skip, detect_interval=detect_interval,
+                                            export_path=export_path, export_policy=export_policy,
+                                            **tile_options)
         
-        self.detector_thread.update_image_signal.connect(lambda img: self.update_image(img, image_label))
-        self.detector_thread.update_results_signal.connect(
-            lambda markdown_text: self.update_results_table(markdown_text, results_table)
-        )
-        self.detector_thread.start()
+        if source_type == 'folder':
+            self.detector_thread.progress_signal.connect(self.update_folder_progress)
+        elif source_type == 'camera':
+            self.detector_thread.camera_stats_signal.connect(self.update_camera_stats)
+        self.detection_source_type = source_type
+        self.latest_metrics = None
+        self.detector_thread.metrics_signal.connect(self.update_metrics)
+        self.detector_thread.finished.connect(self.update_dashboard_info)
+        metrics_label = self.metrics_labels.get('image' if source_type == 'folder' else source_type)
+        if metrics_label is not None:
+            metrics_label.setText("")
+        resolution_label = self.resolution_labels.get(source_type)
+        if resolution_label is not None:
+            resolution_label.setText("Input size: model default" if not target_fps else "")
+            self.detector_thread.resolution_signal.connect(
+                lambda stats: resolution_label.setText(format_resolution(stats)))
         
+        detector = self.detector_thread
+        self.detector_thread.update_image_signal.connect(lambda: self.update_image(detector.take_frame(), image_label))
+        results_model = results_table.model()
+        self.detector_thread.update_results_signal.connect(results_model.set_message)
+        self.detector_thread.detections_signal.connect(results_model.set_detections)
+
+        # 先创建历史记录再启动线程，保证逐帧明细和最终摘要都能关联到该记录
         model_filename = os.path.basename(model_path)
         summary = f"Using model {model_filename} for detection..."
-        self.current_history_id = add_history_record(source_type, source_path, summary)
+        if source_type == 'multi':
+            self.current_history_id = {
+                name: add_history_record(source_type, source, summary)
+                for name, source in zip(stream_names(source_path), source_path)
+            }
+        else:
+            self.current_history_id = add_history_record(source_type, source_path, summary)
         print(f"Created new history record, ID: {self.current_history_id}")
+        if source_type in ('video', 'camera', 'multi'):
+            self.detector_thread.set_recorder(self.detection_recorder, self.current_history_id)
+        engine = self.detector_thread.engine
+        history_ids = self.current_history_id
+        self.detector_thread.detection_finished_signal.connect(
+            lambda summary: self.update_history_with_final_summary(history_ids, summary, engine.stream_summaries))
+        self.detector_thread.start()
+        self.update_dashboard_info()
 
-        results_table.setRowCount(1)
-        tips_item = QTableWidgetItem(f"Using model {model_filename} for detection...")
-        tips_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-        results_table.setItem(0, 0, tips_item)
-        results_table.setSpan(0, 0, 1, 6)
+        results_model.set_message(f"Using model {model_filename} for detection...")
 
-    def update_results_table(self, markdown_text, results_table):
-        results_table.setRowCount(0)
-        
-        if markdown_text == "No targets detected in current frame.":
-            results_table.setRowCount(1)
-            empty_item = QTableWidgetItem(markdown_text)
-            empty_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            results_table.setItem(0, 0, empty_item)
-            results_table.setSpan(0, 0, 1, 6)
-            return
-        
-        markdown_lines = markdown_text.strip().split("\n")
-        if len(markdown_lines) < 3:
-            return
-        
-        data_lines = markdown_lines[2:]
-        for row_idx, line in enumerate(data_lines):
-            line_parts = [part.strip() for part in line.strip("|").split("|")]
-            if len(line_parts) != 6:
-                continue
-            
-            results_table.insertRow(row_idx)
-            for col_idx, part in enumerate(line_parts):
-                cell_item = QTableWidgetItem(part)
-                cell_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                results_table.setItem(row_idx, col_idx, cell_item)
+    def update_results_span(self, results_table, is_message):
+        """提示信息占满整行；显示检测结果时取消合并"""
+        if is_message:
+            results_table.setSpan(0, 0, 1, len(DetectionTableModel.HEADERS))
+        else:
+            results_table.clearSpans()
+
+    def update_metrics(self, snapshot):
+        """实时性能指标：显示在当前检测页面与仪表盘上"""
+        self.latest_metrics = snapshot
+        page_type = 'image' if self.detection_source_type == 'folder' else self.detection_source_type
+        metrics_label = self.metrics_labels.get(page_type)
+        if metrics_label is not None:
+            metrics_label.setText(format_metrics(snapshot))
+        self.update_dashboard_info()
+
+    def update_camera_stats(self, stats):
+        self.camera_stats_label.setText(
+            f"Captured: {stats['captured_frames']} | Dropped: {stats['dropped_frames']} | "
+            f"Latency: {stats['latency_ms_avg']:.0f} ms (max {stats['latency_ms_max']:.0f} ms) | "
+            f"Skipped (static): {stats['skipped_frames']}"
+        )
 
     def create_history_page(self):
         page = QWidget()
@@ -267,26 +367,37 @@ class MainWindow(QMainWindow):
         title = QLabel("<h2>Detection History</h2>")
         layout.addWidget(title)
         
-        self.history_table = QTableWidget()
-        self.history_table.setColumnCount(5)
-        self.history_table.setHorizontalHeaderLabels(["ID", "Detection Type", "Source File/Camera", "Detection Time", "Result Summary"])
-        self.history_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.history_table = QTableView()
+        self.history_model = HistoryTableModel(parent=self.history_table)
+        self.history_table.setModel(self.history_model)
+        self.history_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
         self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.history_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Interactive)
+        # 表格中只显示摘要开头，双击某一行时才读取并显示完整摘要
+        self.history_table.doubleClicked.connect(self.show_history_detail)
 
         layout.addWidget(self.history_table)
         return page
 
+    def show_history_detail(self, index):
+        record_id = self.history_model.record_id(index.row())
+        summary = get_history_summary(record_id)
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Detection History #{record_id}")
+        dialog.resize(800, 600)
+        text_edit = QTextEdit(dialog)
+        text_edit.setReadOnly(True)
+        text_edit.setMarkdown(summary or "")
+        close_button = QPushButton("Close", dialog)
+        close_button.clicked.connect(dialog.accept)
+        dialog_layout = QVBoxLayout(dialog)
+        dialog_layout.addWidget(text_edit)
+        dialog_layout.addWidget(close_button, alignment=Qt.AlignmentFlag.AlignRight)
+        dialog.exec()
+
     def refresh_history_table(self):
-        history_data = get_all_history()
-        self.history_table.setRowCount(0)
-        self.history_table.setRowCount(len(history_data))
-        for row_index, row_data in enumerate(history_data):
-            self.history_table.setItem(row_index, 0, QTableWidgetItem(str(row_data['id'])))
-            self.history_table.setItem(row_index, 1, QTableWidgetItem(row_data['detection_type']))
-            self.history_table.setItem(row_index, 2, QTableWidgetItem(row_data['source_path']))
-            self.history_table.setItem(row_index, 3, QTableWidgetItem(row_data['detection_time']))
-            self.history_table.setItem(row_index, 4, QTableWidgetItem(row_data['result_summary']))
+        # 只读取第一页，其余记录在滚动时按需加载
+        self.history_model.refresh()
 
     def create_dashboard_page(self):
         page = QWidget()
@@ -297,17 +408,38 @@ class MainWindow(QMainWindow):
         self.dashboard_info_label = QLabel()
         self.dashboard_info_label.setTextFormat(Qt.TextFormat.RichText)
         self.dashboard_info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        # 最近一次检测的性能指标（帧率、各阶段耗时、队列深度、内存等）
+        self.dashboard_metrics_label = QLabel()
+        self.dashboard_metrics_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.dashboard_metrics_label.setStyleSheet("font-family: monospace;")
         layout.addWidget(title)
         layout.addWidget(self.dashboard_info_label)
+        layout.addWidget(self.dashboard_metrics_label)
         return page
 
     def update_dashboard_info(self):
-        model_path = self.model_path_input.text()
+        model_path = self.current_model_path()
         model_filename = os.path.basename(model_path)
+        backend_name = "ONNX Runtime (CPU)" if model_backend(model_path) == BACKEND_ONNX else "PyTorch"
         info_text = (f"Please select a function from the left navigation bar to start using.<br><br>"
                      f"Current model: <b style='color:blue;'>{model_filename}</b><br>"
-                     f"System status: <b style='color:green;'>Normal</b>")
+                     f"Inference backend: <b>{backend_name}</b><br>"
+                     f"System status: {self.system_status_html()}")
         self.dashboard_info_label.setText(info_text)
+        if self.latest_metrics is None:
+            self.dashboard_metrics_label.setText("No performance data yet.")
+        else:
+            self.dashboard_metrics_label.setText(
+                f"Performance ({self.detection_source_type}):\n{format_metrics(self.latest_metrics)}")
+
+    def system_status_html(self):
+        """根据检测线程状态与最近的指标快照生成状态文本"""
+        if self.detector_thread is None or not self.detector_thread.isRunning():
+            return "<b style='color:green;'>Idle</b>"
+        if self.latest_metrics is None:
+            return f"<b style='color:blue;'>Detecting ({self.detection_source_type})</b>"
+        return (f"<b style='color:blue;'>Detecting ({self.detection_source_type}), "
+                f"{self.latest_metrics['fps']:.1f} FPS</b>")
 
     def create_detection_page(self, page_type):
         page = QWidget()
@@ -323,19 +455,38 @@ class MainWindow(QMainWindow):
         source_path_label.setWordWrap(True)
         select_button = QPushButton(f"Select {'image' if page_type == 'image' else 'video'}")
         camera_input = None
+        streams_input = None
+        if page_type == 'multi':
+            source_label.setText("<h3>Multi-Stream Detection</h3>")
+            source_path_label.setText("Camera indices and/or video files, separated by commas")
+            streams_input = QLineEdit("0, 1")
+            select_button.setText("Add Video Files")
+            select_button.clicked.connect(lambda: self.add_stream_files(streams_input))
         if page_type == 'camera':
              source_label.setText("<h3>Camera Detection</h3>")
              source_path_label.setText("Default using camera 0, can be manually changed")
              camera_input = QLineEdit("0")
              control_layout.addWidget(camera_input)
+             # 摄像头实时统计：丢帧数与采集到显示的延迟
+             self.camera_stats_label = QLabel("Captured: 0 | Dropped: 0 | Latency: - ms | Skipped (static): 0")
+             self.camera_stats_label.setWordWrap(True)
         start_button = QPushButton("Start Detection")
         stop_button = QPushButton("Stop Detection")
         control_layout.addWidget(source_label)
         if page_type != 'camera':
             control_layout.addWidget(source_path_label)
+            if streams_input is not None:
+                control_layout.addWidget(streams_input)
             control_layout.addWidget(select_button)
         control_layout.addWidget(start_button)
         control_layout.addWidget(stop_button)
+        if page_type == 'camera':
+            control_layout.addWidget(self.camera_stats_label)
+        # 实时性能指标（检测运行时约每秒刷新一次）
+        metrics_label = QLabel("")
+        metrics_label.setWordWrap(True)
+        metrics_label.setStyleSheet("font-family: monospace; font-size: 11px;")
+        self.metrics_labels[page_type] = metrics_label
 
         # 新增：批量图片检测功能（仅在图片检测页面生效）
         if page_type == "image":
@@ -354,10 +505,21 @@ class MainWindow(QMainWindow):
             page_layout.addWidget(self.next_btn)
             control_layout.addLayout(page_layout)
 
+            # 整文件夹批量检测按钮与进度条
+            self.detect_folder_btn = QPushButton("Detect Entire Folder")
+            self.detect_folder_btn.setDisabled(True)
+            control_layout.addWidget(self.detect_folder_btn)
+            self.folder_progress_bar = QProgressBar()
+            self.folder_progress_bar.setFormat("%v / %m")
+            self.folder_progress_bar.setValue(0)
+            control_layout.addWidget(self.folder_progress_bar)
+
             # 翻页按钮点击事件
             self.prev_btn.clicked.connect(lambda: self.switch_image(-1, source_path_label, image_display_label, results_table))
             self.next_btn.clicked.connect(lambda: self.switch_image(1, source_path_label, image_display_label, results_table))
+            self.detect_folder_btn.clicked.connect(lambda: self.detect_entire_folder(image_display_label, results_table))
 
+        control_layout.addWidget(metrics_label)
         control_layout.addStretch()
         
         display_area = QWidget()
@@ -370,18 +532,28 @@ class MainWindow(QMainWindow):
         image_display_label.setMinimumSize(600, 400)
         image_display_label.setStyleSheet("background-color: #333; color: white;")
         
-        results_table = QTableWidget()
-        results_table.setColumnCount(6)
-        results_table.setHorizontalHeaderLabels(["image_id", "class_id", "x_center", "y_center", "width", "height"])
-        results_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        results_table = QTableView()
+        # 多路检测的表格同时列出每一路最近一帧的结果
+        results_model = MultiStreamTableModel(results_table) if page_type == "multi" else DetectionTableModel(results_table)
+        results_table.setModel(results_model)
+        results_model.message_mode_changed.connect(lambda is_message: self.update_results_span(results_table, is_message))
+        results_table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
         results_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         results_table.setFixedHeight(250)
         
         detection_title_label = QLabel("Detection Results:")
         detection_title_label.setStyleSheet("font-weight: bold; margin-bottom: 5px;")
+        title_layout = QHBoxLayout()
+        title_layout.addWidget(detection_title_label)
+        if page_type in ("video", "camera"):
+            # 自适应分辨率开启时显示当前 imgsz 与推理耗时
+            resolution_label = QLabel("")
+            resolution_label.setAlignment(Qt.AlignmentFlag.AlignRight)
+            title_layout.addWidget(resolution_label)
+            self.resolution_labels[page_type] = resolution_label
         
         display_layout.addWidget(image_display_label)
-        display_layout.addWidget(detection_title_label)
+        display_layout.addLayout(title_layout)
         display_layout.addWidget(results_table)
         
         layout.addWidget(control_panel)
@@ -395,9 +567,19 @@ class MainWindow(QMainWindow):
             start_button.clicked.connect(lambda: self.start_detection('video', source_path_label.text(), image_display_label, results_table))
         elif page_type == "camera":
             start_button.clicked.connect(lambda: self.start_detection('camera', camera_input.text(), image_display_label, results_table))
+        elif page_type == "multi":
+            start_button.clicked.connect(lambda: self.start_detection(
+                'multi', parse_stream_sources(streams_input.text()), image_display_label, results_table))
         stop_button.clicked.connect(self.stop_detection)
         return page
         
+    def add_stream_files(self, streams_input):
+        """把选择的视频文件追加到多路输入列表"""
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Select videos", "", "Videos (*.mp4 *.avi *.mov);;All Files (*)")
+        if file_paths:
+            sources = parse_stream_sources(streams_input.text()) + file_paths
+            streams_input.setText(", ".join(sources))
+
     def select_image_folder(self, source_path_label):
         """选择包含多张图片的文件夹，初始化图片列表和索引"""
         folder_path = QFileDialog.getExistingDirectory(self, "Select Image Folder")
@@ -405,23 +587,35 @@ class MainWindow(QMainWindow):
             return
         
         # 过滤出文件夹内的图片文件（支持jpg、png、bmp等格式）
-        img_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
-        self.image_paths = [
-            os.path.join(folder_path, f) 
-            for f in os.listdir(folder_path) 
-            if os.path.splitext(f.lower())[1] in img_extensions
-        ]
+        self.image_paths = list_image_files(folder_path)
         
         if not self.image_paths:
             QMessageBox.warning(self, "Prompt", "No valid image files found in the folder!")
             return
         
         # 初始化当前索引为0，更新UI
+        self.image_folder = folder_path
         self.current_image_index = 0
+        self.image_prefetcher.clear()
         source_path_label.setText(self.image_paths[self.current_image_index])
-        # 激活翻页按钮
+        # 激活翻页按钮与整文件夹检测按钮
         self.prev_btn.setDisabled(False)
         self.next_btn.setDisabled(len(self.image_paths) == 1)
+        self.detect_folder_btn.setDisabled(False)
+        self.folder_progress_bar.setRange(0, len(self.image_paths))
+        self.folder_progress_bar.setValue(0)
+        self.prefetch_neighbours(include_current=True)
+
+    def detect_entire_folder(self, image_label, results_table):
+        """以批量模式检测当前文件夹内的全部图片"""
+        if not self.image_folder:
+            QMessageBox.warning(self, "Warning", "Please select an image folder first!")
+            return
+        self.start_detection('folder', self.image_folder, image_label, results_table)
+
+    def update_folder_progress(self, done, total):
+        self.folder_progress_bar.setRange(0, total)
+        self.folder_progress_bar.setValue(done)
 
     def switch_image(self, step, source_path_label, image_label, results_table):
         """切换图片并触发检测"""
@@ -429,21 +623,83 @@ class MainWindow(QMainWindow):
         # 更新按钮状态
         self.prev_btn.setDisabled(self.current_image_index == 0)
         self.next_btn.setDisabled(self.current_image_index == len(self.image_paths) - 1)
-        # 更新当前图片路径并开始检测
-        source_path_label.setText(self.image_paths[self.current_image_index])
-        self.start_detection('image', self.image_paths[self.current_image_index], image_label, results_table)
+        # 更新当前图片路径；已预取的图片直接显示，否则开始检测
+        image_path = self.image_paths[self.current_image_index]
+        source_path_label.setText(image_path)
+        if not self.show_prefetched_image(image_path, image_label, results_table):
+            self.start_detection('image', image_path, image_label, results_table)
+        self.prefetch_neighbours()
+
+    def prefetch_settings(self):
+        """预取结果依赖的参数（检测参数、权重文件标识、显示尺寸与缩放模式），任一变化后已预取的结果失效"""
+        model_path = self.current_model_path()
+        try:
+            weights = weights_identity(model_path)
+        except OSError:
+            weights = None
+        image_label = self.image_page.findChild(QLabel, "image_display_label")
+        return {"model_path": model_path, "weights": weights, "conf": self.conf_spinbox.value(),
+                "iou": self.iou_spinbox.value(), "top_k": self.top_k_spinbox.value(),
+                "tile_options": self.tile_options(),
+                "display_size": (image_label.width(), image_label.height()),
+                "scale_mode": self.scale_mode_combo.currentData()}
+
+    def tile_options(self):
+        """图片 / 文件夹的切片推理参数，图块边长为 0 时整图推理"""
+        return {"tile_size": self.tile_size_spinbox.value() or None,
+                "tile_overlap": self.tile_overlap_spinbox.value(),
+                "tile_merge": self.tile_merge_combo.currentData()}
+
+    def prefetch_neighbours(self, include_current=False):
+        """在后台预取当前图片之后 N 张、之前 M 张（先后方向交替，离当前越近越先处理）"""
+        if self.current_image_index < 0:
+            return
+        index = self.current_image_index
+        after = self.image_paths[index + 1:index + 1 + self.prefetch_next_spinbox.value()]
+        before = self.image_paths[max(0, index - self.prefetch_prev_spinbox.value()):index][::-1]
+        paths = [self.image_paths[index]] if include_current else []
+        for i in range(max(len(after), len(before))):
+            paths.extend(group[i] for group in (after, before) if i < len(group))
+        if not paths:
+            return
+        settings = self.prefetch_settings()
+        display_size, scale_mode = settings["display_size"], settings["scale_mode"]
+        result_cache = self.result_cache if self.cache_checkbox.isChecked() else None
+        self.image_prefetcher.schedule(
+            paths, settings, result_cache,
+            postprocess=lambda frame: np.ascontiguousarray(resize_to_fit(frame, display_size, scale_mode))
+        )
+
+    def show_prefetched_image(self, image_path, image_label, results_table):
+        """显示预取好的检测结果并写入历史记录；尚未预取完成时返回 False"""
+        entry = self.image_prefetcher.get(image_path, self.prefetch_settings())
+        if entry is None:
+            return False
+        self.stop_detection()
+        annotated_frame, detections = entry
+        self.active_image_label = image_label
+        self.update_image(annotated_frame, image_label)
+        results_table.model().set_detections(detections)
+        self.current_history_id = add_history_record('image', image_path, format_results(detections))
+        return True
 
     def create_settings_page(self):
         page = QWidget()
         layout = QFormLayout(page)
         page.setContentsMargins(20, 20, 20, 20)
 
-# ------------------------------------------需修改：修改成自己的训练模型------------------------------------------------------
-        self.model_path_input = QLineEdit(r"D:\竞赛\2025妈妈杯-大数据挑战赛\MCB2501644\支撑材料\code\Q2\ultralytics-main\ultralytics\runs\yolo11n\weights\best.pt")
-# --------------------------------------------------------------------------------------------------------------------------
+        self.model_path_input = QLineEdit(DEFAULT_MODEL_PATH)
 
         select_model_button = QPushButton("Select Model File")
         select_model_button.clicked.connect(self.select_model_file)
+        self.export_onnx_button = QPushButton("Export and Cache ONNX (CPU)")
+        self.export_onnx_button.clicked.connect(self.export_onnx_model)
+        self.quantize_button = QPushButton("Quantize to INT8 (Calibrate on Folder)...")
+        self.quantize_button.clicked.connect(self.quantize_model)
+        # 模型变体：原始模型或其 INT8 量化版本（量化文件存在时才可选）
+        self.model_variant_combo = QComboBox()
+        self.model_variant_combo.addItem("Original (FP32)", 'fp32')
+        self.model_variant_combo.addItem("INT8 quantized", 'int8')
         self.conf_spinbox = QDoubleSpinBox()
         self.conf_spinbox.setRange(0.0, 1.0)
         self.conf_spinbox.setSingleStep(0.05)
@@ -452,13 +708,218 @@ class MainWindow(QMainWindow):
         self.iou_spinbox.setRange(0.0, 1.0)
         self.iou_spinbox.setSingleStep(0.05)
         self.iou_spinbox.setValue(0.45)
+        self.top_k_spinbox = QSpinBox()
+        self.top_k_spinbox.setRange(1, 100)
+        self.top_k_spinbox.setValue(DEFAULT_TOP_K)
+        self.batch_size_spinbox = QSpinBox()
+        self.batch_size_spinbox.setRange(1, 64)
+        self.batch_size_spinbox.setValue(8)
+        # 文件夹检测的工作进程数与每进程线程数，0 表示按 CPU 核心数自动选择
+        self.pool_workers_spinbox = QSpinBox()
+        self.pool_workers_spinbox.setRange(0, 64)
+        self.pool_workers_spinbox.setSpecialValueText("Auto")
+        self.pool_workers_spinbox.setValue(1)
+        self.pool_threads_spinbox = QSpinBox()
+        self.pool_threads_spinbox.setRange(0, 64)
+        self.pool_threads_spinbox.setSpecialValueText("Auto")
+        self.pool_threads_spinbox.setValue(0)
+        self.pool_ordered_checkbox = QCheckBox("Show folder results in file order")
+        self.pool_ordered_checkbox.setChecked(True)
+        self.prefetch_next_spinbox = QSpinBox()
+        self.prefetch_next_spinbox.setRange(0, 8)
+        self.prefetch_next_spinbox.setValue(2)
+        self.prefetch_prev_spinbox = QSpinBox()
+        self.prefetch_prev_spinbox.setRange(0, 8)
+        self.prefetch_prev_spinbox.setValue(1)
+        self.cache_checkbox = QCheckBox("Reuse cached results for unchanged images")
+        self.cache_checkbox.setChecked(True)
+        self.metrics_log_checkbox = QCheckBox(f"Write performance metrics to {METRICS_LOG_FILE} (rotating)")
+        self.metrics_log_checkbox.setChecked(False)
+        clear_cache_button = QPushButton("Clear Result Cache")
+        clear_cache_button.clicked.connect(self.clear_result_cache)
+        self.scale_mode_combo = QComboBox()
+        self.scale_mode_combo.addItem("Fast", SCALE_FAST)
+        self.scale_mode_combo.addItem("Smooth", SCALE_SMOOTH)
+        # 视频 / 摄像头目标帧率：按实测推理耗时自动调整输入分辨率（0 表示关闭）
+        self.target_fps_spinbox = QSpinBox()
+        self.target_fps_spinbox.setRange(0, 120)
+        self.target_fps_spinbox.setSpecialValueText("Off")
+        self.target_fps_spinbox.setSuffix(" FPS")
+        self.target_fps_spinbox.setValue(0)
+        # 运动门控：变化像素占比低于阈值的帧不推理、复用上一次结果（0 表示关闭），并限制最多连续跳过的帧数
+        self.motion_threshold_spinbox = QDoubleSpinBox()
+        self.motion_threshold_spinbox.setRange(0.0, 50.0)
+        self.motion_threshold_spinbox.setSingleStep(0.1)
+        self.motion_threshold_spinbox.setSpecialValueText("Off")
+        self.motion_threshold_spinbox.setSuffix(" % changed pixels")
+        self.motion_threshold_spinbox.setValue(0.0)
+        self.motion_max_skip_spinbox = QSpinBox()
+        self.motion_max_skip_spinbox.setRange(1, 600)
+        self.motion_max_skip_spinbox.setSuffix(" frames")
+        self.motion_max_skip_spinbox.setValue(DEFAULT_MAX_SKIP)
+        # 每隔 N 帧检测一次，中间帧用跟踪器传播检测框并分配跟踪 ID（1 表示每帧检测）
+        self.detect_interval_spinbox = QSpinBox()
+        self.detect_interval_spinbox.setRange(1, 60)
+        self.detect_interval_spinbox.setSpecialValueText("Every frame (no tracking)")
+        self.detect_interval_spinbox.setPrefix("Every ")
+        self.detect_interval_spinbox.setSuffix(" frames")
+        self.detect_interval_spinbox.setValue(1)
+        # 标注视频导出（视频 / 摄像头），同时按 YOLO 格式写每帧的标签文件
+        self.export_checkbox = QCheckBox("Save annotated video and YOLO labels (video / camera)")
+        self.export_checkbox.setChecked(False)
+        self.export_dir_input = QLineEdit(EXPORT_DIR)
+        self.export_policy_combo = QComboBox()
+        self.export_policy_combo.addItem("Auto (wait for videos, drop for cameras)", None)
+        self.export_policy_combo.addItem("Wait for encoder (no dropped frames)", POLICY_BLOCK)
+        self.export_policy_combo.addItem("Drop frames when encoder is behind", POLICY_DROP)
+        # 高分辨率图片的切片推理：图块边长（0 表示整图推理）、重叠比例与跨图块合并方式
+        self.tile_size_spinbox = QSpinBox()
+        self.tile_size_spinbox.setRange(0, 4096)
+        self.tile_size_spinbox.setSingleStep(32)
+        self.tile_size_spinbox.setSpecialValueText("Off (whole image)")
+        self.tile_size_spinbox.setSuffix(" px")
+        self.tile_size_spinbox.setValue(0)
+        self.tile_overlap_spinbox = QDoubleSpinBox()
+        self.tile_overlap_spinbox.setRange(0.0, 0.5)
+        self.tile_overlap_spinbox.setSingleStep(0.05)
+        self.tile_overlap_spinbox.setValue(DEFAULT_TILE_OVERLAP)
+        self.tile_merge_combo = QComboBox()
+        self.tile_merge_combo.addItem("NMS (keep best box)", MERGE_NMS)
+        self.tile_merge_combo.addItem("WBF (weighted box fusion)", MERGE_WBF)
+        self.pacing_combo = QComboBox()
+        self.pacing_combo.addItem("Pace to source FPS", PACING_SOURCE_FPS)
+        self.pacing_combo.addItem("As fast as possible", PACING_FAST)
         layout.addRow(QLabel("<h2>Parameter Settings</h2>"), None)
         layout.addRow("Model Path:", self.model_path_input)
         layout.addRow("", select_model_button)
+        layout.addRow("", self.export_onnx_button)
+        layout.addRow("", self.quantize_button)
+        layout.addRow("Model Variant:", self.model_variant_combo)
         layout.addRow("Confidence Threshold (conf):", self.conf_spinbox)
         layout.addRow("IOU Threshold (iou):", self.iou_spinbox)
+        layout.addRow("Top-K Boxes per Frame:", self.top_k_spinbox)
+        layout.addRow("Folder Batch Size:", self.batch_size_spinbox)
+        layout.addRow("Folder Worker Processes:", self.pool_workers_spinbox)
+        layout.addRow("Threads per Worker:", self.pool_threads_spinbox)
+        layout.addRow("", self.pool_ordered_checkbox)
+        layout.addRow(f"Tiled Inference Tile Size (e.g. {DEFAULT_TILE_SIZE}):", self.tile_size_spinbox)
+        layout.addRow("Tile Overlap:", self.tile_overlap_spinbox)
+        layout.addRow("Tile Merge Method:", self.tile_merge_combo)
+        layout.addRow("Prefetch Next Images:", self.prefetch_next_spinbox)
+        layout.addRow("Prefetch Previous Images:", self.prefetch_prev_spinbox)
+        layout.addRow("Video Playback Pacing:", self.pacing_combo)
+        layout.addRow("Target FPS (Adaptive Resolution):", self.target_fps_spinbox)
+        layout.addRow("Run Detector (Tracking):", self.detect_interval_spinbox)
+        layout.addRow("Motion Gating Threshold:", self.motion_threshold_spinbox)
+        layout.addRow("Force Refresh After:", self.motion_max_skip_spinbox)
+        layout.addRow("Display Scaling:", self.scale_mode_combo)
+        layout.addRow("Image Result Cache:", self.cache_checkbox)
+        layout.addRow("", clear_cache_button)
+        layout.addRow("Metrics Log:", self.metrics_log_checkbox)
+        layout.addRow("Export:", self.export_checkbox)
+        layout.addRow("Export Folder:", self.export_dir_input)
+        layout.addRow("Export Queue Policy:", self.export_policy_combo)
         return page
 
+    def export_onnx_model(self):
+        """把当前 .pt 权重导出为 ONNX（已导出过则直接复用），并切换为使用 ONNX Runtime 推理"""
+        model_path = self.model_path_input.text()
+        if model_backend(model_path) == BACKEND_ONNX:
+            QMessageBox.information(self, "Prompt", "The current model is already an ONNX model.")
+            return
+        if not os.path.isfile(model_path):
+            QMessageBox.warning(self, "Warning", "Please select a valid model file first!")
+            return
+        self.run_model_tool(self.export_onnx_button, "Exporting...", self.on_onnx_exported,
+                            "Export failed", "Unable to export the model to ONNX", export_onnx, model_path)
+
+    def on_onnx_exported(self, onnx_path):
+        self.model_path_input.setText(onnx_path)
+        QMessageBox.information(self, "Export successful", f"Detection now uses the ONNX model:\n{onnx_path}")
+
+    def run_model_tool(self, button, busy_text, on_success, error_title, error_text, func, *args, **kwargs):
+        """在后台线程中执行模型导出 / 量化，运行期间禁用相关按钮，完成后在界面线程中处理结果"""
+        if self.model_tool_thread is not None:
+            return
+        buttons = (self.export_onnx_button, self.quantize_button)
+        idle_text = button.text()
+        for tool_button in buttons:
+            tool_button.setEnabled(False)
+        button.setText(busy_text)
+        thread = BackgroundTask(func, *args, **kwargs)
+
+        def finish():
+            self.model_tool_thread = None
+            button.setText(idle_text)
+            for tool_button in buttons:
+                tool_button.setEnabled(True)
+
+        def succeeded(result):
+            finish()
+            on_success(result)
+
+        def failed(message):
+            finish()
+            QMessageBox.critical(self, error_title, f"{error_text}: {message}")
+
+        thread.succeeded.connect(succeeded)
+        thread.failed.connect(failed)
+        self.model_tool_thread = thread
+        thread.start()
+
+    def quantized_path_for_current_model(self):
+        """当前模型对应的 INT8 模型路径，尚未量化时返回 None"""
+        try:
+            path = quantized_model_path(self.model_path_input.text())
+        except OSError:
+            return None
+        return path if os.path.isfile(path) else None
+
+    def current_model_path(self):
+        """实际用于检测的模型路径：选择 INT8 变体且量化文件存在时使用量化模型"""
+        if self.model_variant_combo.currentData() == 'int8':
+            quantized_path = self.quantized_path_for_current_model()
+            if quantized_path:
+                return quantized_path
+        return self.model_path_input.text()
+
+    def refresh_model_variants(self):
+        """模型路径变化或量化完成后，更新 INT8 变体是否可选"""
+        available = self.quantized_path_for_current_model() is not None
+        self.model_variant_combo.model().item(1).setEnabled(available)
+        if not available:
+            self.model_variant_combo.setCurrentIndex(0)
+        self.update_dashboard_info()
+
+    def quantize_model(self):
+        """用选定的图片文件夹校准，生成 INT8 模型并显示与 FP32 ONNX 模型的速度 / 一致性对比报告"""
+        model_path = self.model_path_input.text()
+        if not os.path.isfile(model_path):
+            QMessageBox.warning(self, "Warning", "Please select a valid model file first!")
+            return
+        folder_path = QFileDialog.getExistingDirectory(self, "Select Calibration Image Folder")
+        if not folder_path:
+            return
+        self.run_model_tool(self.quantize_button, "Quantizing (this may take a few minutes)...",
+                            self.on_model_quantized, "Quantization failed", "Unable to create the INT8 model",
+                            quantize_with_report, model_path, folder_path,
+                            conf=self.conf_spinbox.value(), iou=self.iou_spinbox.value())
+
+    def on_model_quantized(self, outcome):
+        _, report = outcome
+        self.refresh_model_variants()
+        self.model_variant_combo.setCurrentIndex(1)
+        report_box = QMessageBox(self)
+        report_box.setWindowTitle("INT8 Quantization Report")
+        report_box.setTextFormat(Qt.TextFormat.MarkdownText)
+        report_box.setText(report)
+        report_box.exec()
+
+    def clear_result_cache(self):
+        self.result_cache.clear()
+        self.image_prefetcher.clear()
+        QMessageBox.information(self, "Prompt", "The image result cache has been cleared.")
+
     def create_help_page(self):
         page = QWidget()
         layout = QVBoxLayout(page)
@@ -490,7 +951,7 @@ class MainWindow(QMainWindow):
             <p><b>Q: How to select your own model?</b></p>
             <p>A: Please click on "System Settings" in the left navigation bar, then click the "Select Model File" button and find your .pt model file in your computer.</p>
             <p><b>Q: Why is real-time detection very laggy?</b></p>
-            <p>A: Real-time detection consumes a lot of computing resources. Please ensure your computer configuration is sufficient, or appropriately lower the confidence threshold in "System Settings" to reduce computational load.</p>
+            <p>A: Real-time detection consumes a lot of computing resources. The confidence threshold does not change how much computation each frame needs, so lowering it will not help. Instead, set a "Target FPS" in "System Settings": the system measures inference time and automatically lowers (or raises) the input resolution to keep up, and the current input size is shown above the detection results. Exporting the model to ONNX or using the INT8 variant also speeds up CPU inference. If the camera mostly watches an empty or still scene, enable "Motion Gating": frames without visible change reuse the previous result instead of running the model.</p>
 
             <h2>Contact Us</h2>
             <p>If you encounter any issues that cannot be resolved, please contact us through the "Feedback" page, or send an email to 1828147300@qq.com.</p>
@@ -560,9 +1021,10 @@ class MainWindow(QMainWindow):
             <h1>使用说明</h1>
             <ol>
                 <li><b>System Settings:</b> For first-time use, please configure your YOLO model path in the "System Settings" page.</li>
-                <li><b>Image Detection:</b> Click "Image Detection", select an image or an image folder, then click "Start Detection". You can use the "Previous/Next" buttons to batch detect images in a folder.</li>
-                <li><b>Video Detection:</b> Click "Video Detection", select a video file, then click "Start Detection". The system will process and display each frame.</li>
+                <li><b>Image Detection:</b> Click "Image Detection", select an image or an image folder, then click "Start Detection". You can use the "Previous/Next" buttons to browse images in a folder, or click "Detect Entire Folder" to detect all images in batches. For high-resolution photos with small defects, set a tile size in "System Settings" to detect the image in overlapping tiles.</li>
+                <li><b>Video Detection:</b> Click "Video Detection", select a video file, then click "Start Detection". The system will process and display each frame. To speed up long videos, set "Run Detector (Tracking)" in "System Settings": the detector then runs every N frames, boxes in between are tracked, and the final summary counts each tracked damage once.</li>
                 <li><b>Real-time Detection:</b> Click "Real-time Detection", and the system will automatically call the default camera. You can change the camera ID (e.g., 0, 1, 2...) in the input box.</li>
+                <li><b>Multi-Stream Detection:</b> Click "Multi-Stream Detection", enter several camera IDs and/or video files separated by commas (or use "Add Video Files"), then click "Start Detection". All streams share one model and are detected together in one batch; the streams are shown in a grid.</li>
             </ol>
             <p>Enjoy your experience!</p>
         </body>
@@ -591,7 +1053,7 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.critical(self, "Submission failed", "Failed to write your feedback to the database. Please check the backend logs.")
     def select_model_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select model file", "", "PyTorch Models (*.pt)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select model file", "", "YOLO Models (*.pt *.onnx);;PyTorch Models (*.pt);;ONNX Models (*.onnx)")
         if file_path:
             self.model_path_input.setText(file_path)
 
@@ -604,8 +1066,11 @@ class MainWindow(QMainWindow):
             # 重置批量图片列表（避免与单张选择冲突）
             self.image_paths = []
             self.current_image_index = -1
+            self.image_folder = None
+            self.image_prefetcher.cancel()
             self.prev_btn.setDisabled(True)
             self.next_btn.setDisabled(True)
+            self.detect_folder_btn.setDisabled(True)
 
     def stop_detection(self):
         if self.detector_thread and self.detector_thread.isRunning():
@@ -613,12 +1078,26 @@ class MainWindow(QMainWindow):
             self.detector_thread = None
 
     def update_image(self, frame, image_label):
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        scaled_pixmap = QPixmap.fromImage(qt_image).scaled(image_label.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-        image_label.setPixmap(scaled_pixmap)
+        if frame is None:
+            return
+        # 直接使用 BGR888 格式构造图像，省去颜色转换拷贝；画面已在检测线程内缩放到显示尺寸
+        h, w = frame.shape[:2]
+        qt_image = QImage(frame.data, w, h, frame.strides[0], QImage.Format.Format_BGR888)
+        pixmap = QPixmap.fromImage(qt_image)
+        label_size = image_label.size()
+        if w > label_size.width() or h > label_size.height():
+            # 显示区域刚被缩小、检测线程尚未按新尺寸输出时的兜底缩放
+            if self.scale_mode_combo.currentData() == SCALE_SMOOTH:
+                transformation = Qt.TransformationMode.SmoothTransformation
+            else:
+                transformation = Qt.TransformationMode.FastTransformation
+            pixmap = pixmap.scaled(label_size, Qt.AspectRatioMode.KeepAspectRatio, transformation)
+        image_label.setPixmap(pixmap)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.detector_thread and self.active_image_label:
+            self.detector_thread.set_display_size(self.active_image_label.width(), self.active_image_label.height())
 
     def closeEvent(self, event):
         reply = QMessageBox.question(self, 'Exit Program', 'Are you sure you want to exit this system?',
@@ -626,6 +1105,13 @@ class MainWindow(QMainWindow):
                                      QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
             self.stop_detection()
+            if self.model_tool_thread is not None:
+                # 等待正在进行的导出 / 量化结束，避免写出不完整的模型文件
+                QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+                self.model_tool_thread.wait()
+                QApplication.restoreOverrideCursor()
+            self.image_prefetcher.close()
+            self.detection_recorder.close()
             event.accept()
         else:
             event.ignore()
@@ -0,0 +1,165 @@
+# video_exporter.py
+# 标注视频导出：在独立线程中用 cv2.VideoWriter 编码标注画面，并按 YOLO 格式为每帧写一个标签文件；
+# 队列有界，编码再慢也不会拖住推理；本模块不导入 PyQt6
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+# 队列满时的处理策略：丢弃新帧（实时输入，推理不等待编码）/ 阻塞等待（视频文件，导出完整不丢帧）
+POLICY_DROP = 'drop'
+POLICY_BLOCK = 'block'
+# 待编码帧队列长度（1080p 画面每帧约 6 MB）
+EXPORT_QUEUE_SIZE = 16
+# 无法获得源帧率时写入视频的帧率
+DEFAULT_EXPORT_FPS = 25.0
+# 默认导出目录
+EXPORT_DIR = "exports"
+
+_END = object()
+
+
+def default_export_path(source, export_dir=EXPORT_DIR):
+    """为一次检测生成导出文件路径：<导出目录>/<视频名或 camera编号>_<时间>.mp4"""
+    source = str(source)
+    stem = f"camera{source}" if source.isdigit() else os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(export_dir, f"{stem}_annotated_{time.strftime('%Y%m%d_%H%M%S')}.mp4")
+
+
+def labels_dir_for(export_path):
+    """标签目录与导出视频同名：video.mp4 -> video_labels/"""
+    return os.path.splitext(export_path)[0] + "_labels"
+
+
+def _fourcc_for(path):
+    return cv2.VideoWriter_fourcc(*("XVID" if path.lower().endswith(".avi") else "mp4v"))
+
+
+class VideoExporter:
+    """
+    write() 把 (标注画面, FrameDetections) 放入有界队列，后台线程按顺序编码并写标签。
+    标签文件 <视频名>_<导出帧序号>.txt 与导出视频中的帧一一对应，每行为 "class x_center y_center width height"（归一化），
+    无目标的帧写空文件；丢帧策略下被丢弃的帧既不进入视频也不写标签。
+    带时间戳的帧按时间戳对齐到输出帧率：与上一帧之间缺少的输出帧用上一帧（及其标签）重复补齐，
+    摄像头只处理最新帧、推理帧率低于标称帧率时，导出视频的时间轴仍与实际采集时间一致。
+    """
+
+    def __init__(self, path, fps=None, policy=POLICY_BLOCK, write_labels=True, queue_size=EXPORT_QUEUE_SIZE):
+        self.path = path
+        self.fps = fps if fps and fps > 0 else DEFAULT_EXPORT_FPS
+        self.policy = policy
+        self.labels_dir = labels_dir_for(path) if write_labels else None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._writer = None
+        # 按时间戳对齐时的起始时间戳与已写到的输出帧位置
+        self._first_timestamp = None
+        self._last_slot = -1
+        # 统计：已写入帧数（含重复帧）、为补齐时间轴重复写入的帧数、因队列满被丢弃的帧数；编码线程出错时保存错误信息
+        self.written_frames = 0
+        self.repeated_frames = 0
+        self.dropped_frames = 0
+        self.error = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.labels_dir:
+            os.makedirs(self.labels_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def write(self, frame, detections):
+        """提交一帧（可在任意线程调用）；丢帧策略下队列满时立即返回 False"""
+        if self.error is not None:
+            return False
+        item = (frame, detections)
+        if self.policy == POLICY_DROP:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped_frames += 1
+                return False
+        # 阻塞策略：编码线程异常退出时不再等待
+        while self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        """写完队列中剩余的帧并关闭文件"""
+        if self._thread is None:
+            return
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_END, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+        self._thread = None
+
+    def summary(self):
+        text = f"Annotated video exported to {self.path} ({self.written_frames} frames"
+        if self.repeated_frames:
+            text += f", {self.repeated_frames} repeated to keep capture timing"
+        if self.dropped_frames:
+            text += f", {self.dropped_frames} dropped"
+        text += ")"
+        if self.labels_dir:
+            text += f", YOLO labels in {self.labels_dir}"
+        return text
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _END:
+                    break
+                frame, detections = item
+                if self._writer is None:
+                    height, width = frame.shape[:2]
+                    self._writer = cv2.VideoWriter(self.path, _fourcc_for(self.path), self.fps, (width, height))
+                    if not self._writer.isOpened():
+                        raise OSError(f"Unable to open video writer for {self.path}")
+                copies = self._copies_for(detections.timestamp)
+                for _ in range(copies):
+                    self._writer.write(frame)
+                    if self.labels_dir:
+                        self._write_labels(detections)
+                    self.written_frames += 1
+                self.repeated_frames += copies - 1
+        except Exception as e:
+            self.error = f"Video export failed: {e}"
+            print(self.error)
+        finally:
+            if self._writer is not None:
+                self._writer.release()
+
+    def _copies_for(self, timestamp):
+        """该帧需要写入的次数：按时间戳计算其在输出帧率下的位置，补齐与上一帧之间的空缺；无时间戳时写一次"""
+        if timestamp is None:
+            return 1
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        slot = int(round((timestamp - self._first_timestamp) * self.fps))
+        # 两帧落在同一位置时仍写入（不丢弃已处理的帧），后续帧的空缺会把时间轴拉回
+        copies = max(1, slot - self._last_slot)
+        self._last_slot += copies
+        return copies
+
+    def _write_labels(self, detections):
+        stem = os.path.splitext(os.path.basename(self.path))[0]
+        label_path = os.path.join(self.labels_dir, f"{stem}_{self.written_frames}.txt")
+        with open(label_path, "w", encoding="utf-8") as f:
+            for box in detections.boxes:
+                f.write(f"{int(box[0])} {box[2]:.6f} {box[3]:.6f} {box[4]:.6f} {box[5]:.6f}\n")
@@ -1,179 +1,147 @@
 import cv2
-import os
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal
-from ultralytics import YOLO
-from collections import defaultdict
+import numpy as np
+from detection_core import DetectionEngine
+
+# 画面缩放模式：快速（最近邻）/ 平滑（区域插值）
+SCALE_FAST = 'fast'
+SCALE_SMOOTH = 'smooth'
+
+
+def resize_to_fit(frame, display_size, scale_mode=SCALE_FAST):
+    """把画面等比缩放到显示区域 (宽, 高) 内；display_size 为空时原样返回"""
+    if not display_size:
+        return frame
+    target_w, target_h = display_size
+    h, w = frame.shape[:2]
+    scale = min(target_w / w, target_h / h)
+    new_w, new_h = max(1, int(w * scale)), max(1, int(h * scale))
+    if (new_w, new_h) == (w, h):
+        return frame
+    if scale_mode == SCALE_SMOOTH:
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    else:
+        interpolation = cv2.INTER_NEAREST
+    return cv2.resize(frame, (new_w, new_h), interpolation=interpolation)
+
 
 class YoloDetector(QThread):
-    update_image_signal = pyqtSignal(object)
+    """检测线程：在 QThread 中运行 DetectionEngine，并把回调转换为 Qt 信号"""
+
+    # 有新画面待显示（画面本身通过 take_frame() 获取，未被取走前只通知一次）
+    update_image_signal = pyqtSignal()
+    # 状态/错误提示文本
     update_results_signal = pyqtSignal(str)
+    # 每帧的结构化检测结果（FrameDetections）
+    detections_signal = pyqtSignal(object)
     detection_finished_signal = pyqtSignal(str)
-
-    def __init__(self, model_path, source_type, source_path, conf_threshold, iou_threshold):
+    # 文件夹检测进度：(已完成数量, 总数量)
+    progress_signal = pyqtSignal(int, int)
+    # 摄像头统计：采集帧数、丢帧数、采集到显示的延迟等
+    camera_stats_signal = pyqtSignal(dict)
+    # 自适应分辨率：当前 imgsz、目标帧率与推理耗时
+    resolution_signal = pyqtSignal(dict)
+    # 约每秒一次的性能指标快照（帧率、各阶段 p50/p95 耗时、队列深度、丢帧、内存、模型加载耗时）
+    metrics_signal = pyqtSignal(dict)
+
+    def __init__(self, model_path, source_type, source_path, conf_threshold, iou_threshold,
+                 display_size=None, scale_mode=SCALE_FAST, **engine_options):
+        """engine_options 原样传给 DetectionEngine（batch_size、pacing_mode、top_k、result_cache、target_fps、metrics_log 等）"""
         super().__init__()
-        self.model_path = model_path
-        self.source_type = source_type
-        self.source_path = source_path
-        self.conf_threshold = conf_threshold
-        self.iou_threshold = iou_threshold
-        self.model = None
-        self.is_running = True
+        self.engine = DetectionEngine(model_path, source_type, source_path, conf_threshold, iou_threshold,
+                                      **engine_options)
+        self.engine.on_frame = self.publish_frame
+        self.engine.on_detections = self._on_detections
+        self.engine.on_message = self.update_results_signal.emit
+        self.engine.on_progress = self.progress_signal.emit
+        self.engine.on_finished = self.detection_finished_signal.emit
+        self.engine.on_camera_stats = self.camera_stats_signal.emit
+        self.engine.on_resolution = self.resolution_signal.emit
+        self.engine.on_metrics = self._on_metrics
+        # 显示相关：目标显示尺寸 (宽, 高)、缩放模式、待显示帧槽位
+        self.display_size = display_size
+        self.scale_mode = scale_mode
+        self._frame_lock = threading.Lock()
+        self._pending_frame = None
+        self.coalesced_frames = 0
+        # 逐帧检测明细的后台写入器（可选）
+        self.recorder = None
+        self.history_id = None
 
     def run(self):
-        try:
-            self.model = YOLO(self.model_path)
-            print("YOLO model loaded successfully.")
-        except Exception as e:
-            print(f"Error: Unable to load model {self.model_path}. Error: {e}")
-            self.update_results_signal.emit(f"Model loading failed: {e}")
-            return
-
-        if self.source_type == 'image':
-            self.process_image()
-        elif self.source_type == 'video':
-            self.process_video()
-        elif self.source_type == 'camera':
-            self.process_camera()
-
-    def get_image_id(self):
-        """提取图片ID（文件名去除路径和后缀）"""
-        filename = os.path.basename(self.source_path)
-        image_id, _ = os.path.splitext(filename)
-        return image_id
-
-    def filter_top4_boxes(self, result):
-        """筛选置信度前四的检测框"""
-        if result.boxes is None or len(result.boxes) == 0:
-            return
-        boxes = result.boxes
-        box_info = []
-        for i in range(len(boxes)):
-            conf = boxes.conf[i].item()
-            box_info.append( (conf, i) )
-        # 按置信度降序排序
-        box_info.sort(key=lambda x: x[0], reverse=True)
-        # 取前四个的索引
-        top4_indices = [idx for conf, idx in box_info[:4]]
-        # 筛选出前四个box
-        result.boxes = boxes[top4_indices]
-
-    def process_image(self):
-        results = self.model(self.source_path, conf=self.conf_threshold, iou=self.iou_threshold)
-        self.filter_top4_boxes(results[0])
-        annotated_frame = results[0].plot()
-        self.update_image_signal.emit(annotated_frame)
-        result_text = self.format_results(results[0], self.get_image_id())
-        self.update_results_signal.emit(result_text)
-        self.detection_finished_signal.emit(result_text)
-
-    def process_video(self):
-        cap = cv2.VideoCapture(self.source_path)
-        if not cap.isOpened():
-            self.update_results_signal.emit("Error: Unable to open video file.")
-            return
-            
-        last_result_text = "Video processing in progress..."
-        while self.is_running and cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            results = self.model(frame, conf=self.conf_threshold, iou=self.iou_threshold)
-            self.filter_top4_boxes(results[0])
-            annotated_frame = results[0].plot()
-            self.update_image_signal.emit(annotated_frame)
-            
-            last_result_text = self.format_results(results[0], "video_frame")
-            self.update_results_signal.emit(last_result_text)
-            self.msleep(30)
-
-        cap.release()
-        
-        if self.is_running:
-            final_summary = "Video processing completed.\n" + last_result_text
-            self.update_results_signal.emit("Video processing completed.")
-            self.detection_finished_signal.emit(final_summary)
-
-    def process_camera(self):
-        try:
-            camera_index = int(self.source_path)
-        except ValueError:
-            camera_index = self.source_path
-
-        cap = cv2.VideoCapture(camera_index)
-        if not cap.isOpened():
-            self.update_results_signal.emit("Error: Unable to open camera.")
-            return
-
-        while self.is_running:
-            ret, frame = cap.read()
-            if not ret:
-                self.update_results_signal.emit("Error: Unable to read frame from camera.")
-                break
-            
-            results = self.model(frame, conf=self.conf_threshold, iou=self.iou_threshold, verbose=False)
-            self.filter_top4_boxes(results[0])
-            annotated_frame = results[0].plot()
-            self.update_image_signal.emit(annotated_frame)
-            
-            result_text = self.format_results(results[0], "camera_frame")
-            self.update_results_signal.emit(result_text)
-        
-        cap.release()
-        print("Camera released.")
-
-    def format_results(self, result, image_id):
-        """生成markdown格式的检测结果表格（包含归一化坐标，取置信度前四的结果）"""
-        if result.boxes is None or len(result.boxes) == 0:
-            return "No target detected in the current frame."
-
-        class_names = result.names
-# -----------------------------------------------需修改：定义类别与ID的映射关系--------------------------------------------------
-        class_id_map = {"hole": 0, "broken": 1, "rusty": 2, "scratch": 3, "sd": 4, "hd": 5, "vd": 6}
-# ---------------------------------------------------------------------------------------------------------------------------
-        # 获取图像原始尺寸（高度、宽度）用于归一化
-        orig_height, orig_width = result.orig_shape  # YOLO的orig_shape返回(高, 宽)
-        # markdown表格表头
-        text_lines = [
-            "| image_id | class_id | x_center | y_center | width | height |",
-            "|----------|----------|----------|----------|-------|--------|"
-        ]
-
-        # 收集所有box信息并按置信度降序排序，取前4个
-        box_info_list = []
-        for box in result.boxes:
-            conf = box.conf.cpu().numpy()[0]
-            cls = int(box.cls)
-            xywh = box.xywh.cpu().numpy()[0]
-            box_info_list.append( (conf, cls, xywh) )
-        
-        # 按置信度降序排序（此处因filter_top4_boxes已处理，排序可省略但保留逻辑一致性）
-        box_info_list.sort(key=lambda x: x[0], reverse=True)
-        # 取前4个结果
-        box_info_list = box_info_list[:4]
-
-        for conf, cls, xywh in box_info_list:
-            class_name = class_names[cls]
-            # 根据映射关系生成class_id
-            class_id = f"{class_id_map[class_name]}-{class_name}"
-
-            x_center_pix, y_center_pix, width_pix, height_pix = xywh
-            
-            # 归一化计算（保留4位小数）
-            x_center = f"{x_center_pix / orig_width:.4f}"  # x中心坐标 / 图像宽度
-            y_center = f"{y_center_pix / orig_height:.4f}"  # y中心坐标 / 图像高度
-            width = f"{width_pix / orig_width:.4f}"  # 宽度 / 图像宽度
-            height = f"{height_pix / orig_height:.4f}"  # 高度 / 图像高度
-            
-            # 拼接markdown表格行
-            text_lines.append(
-                f"| {image_id} | {class_id} | {x_center} | {y_center} | {width} | {height} |"
-            )
-        
-        return "\n".join(text_lines)
+        self.engine.run()
+
+    def set_recorder(self, recorder, history_id):
+        """启动前调用：把每帧检测结果交给后台写入器保存到 detections 表；
+        多路检测时 history_id 为 {流名称: 历史记录 ID}，按 image_id 写入各自的记录"""
+        self.recorder = recorder
+        self.history_id = history_id
+
+    def _on_detections(self, detections):
+        # 在检测线程内直接入队，不经过界面线程
+        if self.recorder is not None:
+            history_id = self.history_id
+            if isinstance(history_id, dict):
+                history_id = history_id[detections.image_id]
+            self.recorder.record(history_id, detections)
+        self.detections_signal.emit(detections)
+
+    def _on_metrics(self, snapshot):
+        # 补充显示与写库相关的指标：被合并（未显示）的帧数、待写入数据库的队列深度
+        snapshot["gauges"]["coalesced_frames"] = self.coalesced_frames
+        if self.recorder is not None:
+            snapshot["gauges"]["recorder_queue"] = self.recorder.pending()
+        self.metrics_signal.emit(snapshot)
+
+    def set_display_size(self, width, height):
+        """界面显示区域尺寸变化时调用，后续帧按新尺寸缩放"""
+        self.display_size = (width, height)
+
+    def resize_for_display(self, frame):
+        """在检测线程内按显示区域等比缩放画面，界面线程无需再做缩放"""
+        return resize_to_fit(frame, self.display_size, self.scale_mode)
+
+    def publish_frame(self, frame):
+        """放入最新待显示帧；界面尚未取走上一帧时直接覆盖，只保留最新的一帧"""
+        frame = np.ascontiguousarray(self.resize_for_display(frame))
+        with self._frame_lock:
+            notify = self._pending_frame is None
+            if not notify:
+                self.coalesced_frames += 1
+            self._pending_frame = frame
+        if notify:
+            self.update_image_signal.emit()
+
+    def take_frame(self):
+        """界面线程取走最新待显示帧（BGR）"""
+        with self._frame_lock:
+            frame, self._pending_frame = self._pending_frame, None
+        return frame
 
     def stop(self):
-        self.is_running = False
+        self.engine.stop()
         print("Requesting to stop the detection thread...")
         self.wait()
-        print("Detection thread has stopped.")
\ No newline at end of file
+        print("Detection thread has stopped.")
+
+
+class BackgroundTask(QThread):
+    """在后台线程中执行一次耗时操作（模型导出、量化等），完成后通过信号把返回值或错误信息交回界面线程"""
+
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)